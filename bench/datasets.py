@@ -0,0 +1,104 @@
+"""Deterministic synthetic inputs for the benchmarks"""
+import random
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+TILE_SIZE = 256
+
+
+def activations(count, seed=0, summits=None):
+    """
+    sotl.as-style activation records around Hungary.
+
+    About a third as many summits as activations by default, so repeat
+    activations of the same summit occur like in real logs.
+    """
+    rng = random.Random(seed)
+    summits = summits or max(count // 3, 1)
+    places = [
+        (f"HA/{rng.choice(['BP', 'MK', 'ND', 'VE', 'ZA'])}-{i:03d}", f"Summit {i}",
+         round(46.0 + rng.random() * 2.5, 6), round(16.5 + rng.random() * 6.0, 6))
+        for i in range(summits)
+    ]
+    result = []
+    for i in range(count):
+        code, name, lat, lon = places[rng.randrange(summits)]
+        result.append({
+            "date": f"{2015 + i * 10 // max(count, 1)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T08:00:00.000Z",
+            "summit": {"code": code, "name": name, "coordinates": {"latitude": lat, "longitude": lon}},
+        })
+    return result
+
+
+def find_logs(count, seed=0, start_year=2008, end_year=2025):
+    """geocaching.hu `/logsbyuser?fields=date` style records, unsorted"""
+    rng = random.Random(seed)
+    return [
+        {"date": f"{rng.randint(start_year, end_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                 f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"}
+        for _ in range(count)
+    ]
+
+
+def synthetic_tile(seed):
+    """Palette PNG with OSM-like flat areas and lines"""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (TILE_SIZE, TILE_SIZE), (242, 239, 233))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(TILE_SIZE), rng.randrange(TILE_SIZE)
+        draw.rectangle((x, y, x + rng.randrange(80), y + rng.randrange(80)),
+                       fill=rng.choice([(170, 211, 223), (205, 235, 176), (224, 223, 223)]))
+    for _ in range(20):
+        draw.line([(rng.randrange(TILE_SIZE), rng.randrange(TILE_SIZE)) for _ in range(4)],
+                  fill=rng.choice([(255, 255, 255), (247, 250, 191), (232, 146, 162)]), width=rng.randrange(1, 6))
+    buf = BytesIO()
+    img.quantize(64).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def wwa_page(callsign, rows=1, seed=0):
+    """
+    hamaward.cloud standings page as parsed by wwa.fetch_stats: a header row
+    and `rows` result rows of numeric cells, the first one for `callsign`,
+    inside the usual page furniture.
+    """
+    rng = random.Random(seed)
+    header = ["Valid QSO", "Score", "Rank", "Bands", "Modes"]
+
+    def cell(content):
+        return f'<div class="table-body-cell">{content}</div>'
+
+    def row(cells):
+        return f'<div class="resp-table-row">{"".join(cell(c) for c in cells)}</div>'
+
+    body = [row(header)]
+    for i in range(rows):
+        call = callsign if i == 0 else f"HA{rng.randint(1, 9)}{''.join(rng.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=3))}"
+        qsos = rng.randint(1, 5000)
+        body.append(row([
+            f'{qsos}<br><small><a href="?callsign={call}">{call}</a></small>',
+            f"{qsos * rng.randint(1, 3)}<br><small>pts</small>",
+            i + 1,
+            rng.randint(1, 10),
+            rng.randint(1, 4),
+        ]))
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>WWA standings</title>
+<style>{".resp-table-row { display: table-row; } " * 50}</style>
+<script>{"var x = 1; " * 200}</script>
+</head>
+<body>
+<nav>{"".join(f'<a href="/aw{i}">Award {i}</a>' for i in range(50))}</nav>
+<div id="resp-table">
+{chr(10).join(body)}
+</div>
+<footer>{"<p>hamaward.cloud</p>" * 20}</footer>
+</body>
+</html>
+"""
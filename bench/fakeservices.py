@@ -0,0 +1,206 @@
+"""
+Local stand-ins for sotl.as, tile.openstreetmap.org, hamaward.cloud and
+api.geocaching.hu, serving deterministic synthetic data.
+
+    uv run python -m bench.fakeservices [--latency MS] [--port PORT] [--fail N] [--etags]
+
+Run directly, it serves until interrupted and prints the environment
+variables that point the report scripts (or runner.py) at it. Every response
+is delayed by the configured latency to stand in for the network round trip.
+
+With --fail N the first N requests of every route are answered 503 with a
+`Retry-After`; with --etags responses carry an ETag and a matching
+`If-None-Match` is answered 304. bench.http_client uses both to exercise
+HttpClient's retries and response cache.
+
+    /tiles/{z}/{x}/{y}.png       synthetic_tile seeded by z/x/y
+    /sota/{callsign}             `activations` records
+    /wwa/{award}?callsign=CALL   `wwa_page` for CALL
+    /logsbyuser?userid=N         `find_logs` seeded by N
+"""
+import functools
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench.datasets import activations, find_logs, synthetic_tile, wwa_page
+
+
+class FakeServices:
+    """
+    The stand-in HTTP server on a background thread; a context manager.
+
+    `activation_count`, `log_count` and `wwa_rows` size the generated
+    responses, `latency` (seconds) delays each one. The first `fail_first`
+    requests of each route get `fail_status` with a `Retry-After` of
+    `retry_after` seconds (None: no header). With `etags`, responses carry
+    an ETag and a matching `If-None-Match` gets 304. `requests` counts the
+    requests per route, `statuses` the responses per (route, status).
+    """
+
+    def __init__(self, latency=0.0, activation_count=1000, log_count=10_000, wwa_rows=1, port=0,
+                 fail_first=0, fail_status=503, retry_after=0, etags=False):
+        self.latency = latency
+        self.activation_count = activation_count
+        self.log_count = log_count
+        self.wwa_rows = wwa_rows
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.etags = etags
+        self.requests = {}
+        self.statuses = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = None
+
+    @property
+    def tile_url(self):
+        return self.base_url + "/tiles/{z}/{x}/{y}.png"
+
+    @property
+    def sota_url(self):
+        return self.base_url + "/sota/{callsign}"
+
+    @property
+    def wwa_url(self):
+        return self.base_url + "/wwa/{award}?callsign={callsign}"
+
+    @property
+    def geocaching_url(self):
+        return self.base_url + "/logsbyuser"
+
+    def environ(self):
+        """Environment variables that point the report scripts here"""
+        return {
+            "TILE_URL": self.tile_url,
+            "SOTA_API_URL": self.sota_url,
+            "WWA_URL": self.wwa_url,
+            "GEOCACHING_API_URL": self.geocaching_url,
+        }
+
+    @functools.lru_cache(maxsize=1024)
+    def tile(self, z, x, y):
+        return synthetic_tile(f"{z}/{x}/{y}")
+
+    @functools.lru_cache(maxsize=64)
+    def sota(self, callsign):
+        return json.dumps(activations(self.activation_count)).encode()
+
+    @functools.lru_cache(maxsize=64)
+    def wwa(self, callsign):
+        return wwa_page(callsign, self.wwa_rows).encode()
+
+    @functools.lru_cache(maxsize=64)
+    def logs(self, user_id):
+        return json.dumps(find_logs(self.log_count, seed=user_id)).encode()
+
+    def reset(self):
+        """Forget the requests so far; failures start over"""
+        with self.lock:
+            self.requests.clear()
+            self.statuses.clear()
+
+    def respond(self, path, query):
+        """(route, content type, body) for a request, or None"""
+        parts = path.strip("/").split("/")
+        if parts[0] == "tiles" and len(parts) == 4 and parts[3].endswith(".png"):
+            return "tiles", "image/png", self.tile(int(parts[1]), int(parts[2]), int(parts[3][:-4]))
+        if parts[0] == "sota" and len(parts) == 2:
+            return "sota", "application/json", self.sota(parts[1].upper())
+        if parts[0] == "wwa" and len(parts) <= 2:
+            return "wwa", "text/html; charset=utf-8", self.wwa(query.get("callsign", ["N0CALL"])[0].upper())
+        if path == "/logsbyuser":
+            return "logsbyuser", "application/json", self.logs(int(query.get("userid", ["0"])[0]))
+        return None
+
+    def handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                try:
+                    found = services.respond(url.path, parse_qs(url.query))
+                except ValueError:
+                    found = None
+                if services.latency:
+                    time.sleep(services.latency)
+                if found is None:
+                    self.send_error(404)
+                    return
+                route, content_type, body = found
+                with services.lock:
+                    seen = services.requests.get(route, 0)
+                    services.requests[route] = seen + 1
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"' if services.etags else None
+                if seen < services.fail_first:
+                    status = services.fail_status
+                elif etag is not None and self.headers.get("If-None-Match") == etag:
+                    status = 304
+                else:
+                    status = 200
+                with services.lock:
+                    services.statuses[route, status] = services.statuses.get((route, status), 0) + 1
+
+                self.send_response(status)
+                if status == services.fail_status:
+                    if services.retry_after is not None:
+                        self.send_header("Retry-After", str(services.retry_after))
+                    body = b""
+                else:
+                    self.send_header("Content-Type", content_type)
+                    if etag is not None:
+                        self.send_header("ETag", etag)
+                    if status == 304:
+                        body = b""
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    args = sys.argv[1:]
+    latency = float(args[args.index("--latency") + 1]) / 1000 if "--latency" in args else 0.0
+    port = int(args[args.index("--port") + 1]) if "--port" in args else 8000
+    fail_first = int(args[args.index("--fail") + 1]) if "--fail" in args else 0
+    with FakeServices(latency=latency, port=port, fail_first=fail_first, etags="--etags" in args) as services:
+        for name, value in services.environ().items():
+            print(f"export {name}='{value}'")
+        print("export GEOCACHING_HU_UIDS='1:Jómagam,2:Vetélytárs'")
+        try:
+            services.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Find log ingestion: payload bytes to cumulative daily series.
+
+    uv run python -m bench.find_logs [LOGS]
+
+"before" is the previous path: response.json(), strptime/strftime per log
+into a dict, cumulative list of day strings, then strptime again for the
+plot. "after" streams the array, keeps only the date strings and does the
+rest with datetime64[D] arrays.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from bench.datasets import find_logs
+from findlogs import cumulative, iter_json_array, parse_days
+
+
+def before(payload):
+    data = json.loads(payload)
+    finds_by_date = defaultdict(int)
+    for item in data:
+        if 'date' in item:
+            date = datetime.strptime(item['date'], '%Y-%m-%d %H:%M:%S')
+            finds_by_date[date.strftime('%Y-%m-%d')] += 1
+    result = []
+    total = 0
+    for date_str in sorted(finds_by_date.keys()):
+        total += finds_by_date[date_str]
+        result.append((date_str, total))
+    dates = [datetime.strptime(d[0], '%Y-%m-%d') for d in result]
+    counts = [d[1] for d in result]
+    return dates, counts
+
+
+def after(payload, chunk=65536):
+    chunks = (payload[i:i + chunk] for i in range(0, len(payload), chunk))
+    data = [item['date'] for item in iter_json_array(chunks) if 'date' in item]
+    return cumulative(parse_days(data))
+
+
+def measure(fn, payload, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(payload)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    payload = json.dumps(find_logs(count)).encode()
+    print(f"{count} logs, {len(payload) / 1e6:.1f} MB payload")
+
+    (dates, counts), t_before, m_before = measure(before, payload)
+    (days, totals), t_after, m_after = measure(after, payload)
+    assert np.array_equal(np.array(dates, dtype="datetime64[D]"), days)
+    assert np.array_equal(counts, totals)
+
+    print(f"before: {t_before * 1000:8.1f} ms  peak {m_before / 1e6:6.1f} MB")
+    print(f" after: {t_after * 1000:8.1f} ms  peak {m_after / 1e6:6.1f} MB  ({t_before / t_after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Monte Carlo catch-up forecast: simulation, bands and catch dates.
+
+    uv run python -m bench.forecast [SIMULATIONS]
+
+Bootstraps 365 future days from the last 90 for 2 and 4 users with synthetic
+find histories, as geocaching_hu_api_viz.py does.
+"""
+import sys
+import time
+
+import numpy as np
+
+from bench.datasets import find_logs
+from findlogs import cumulative, parse_days
+from forecast import catch_days, catch_summary, percentile_bands, recent_daily_finds, simulate
+
+HORIZON = 365
+WINDOW = 90
+
+
+def run(series, simulations):
+    end = max(days[-1] for days, _ in series)
+    now = np.array([totals[-1] for _, totals in series])
+    paths = simulate(recent_daily_finds(series, end, WINDOW), HORIZON, simulations, seed=0)
+    percentile_bands(now, paths, np.arange(6, HORIZON, 7))
+    for i in range(len(series)):
+        for j in range(len(series)):
+            if i != j:
+                catch_summary(catch_days(now[i], paths[i], now[j], paths[j]))
+
+
+def main():
+    simulations = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    for users in (2, 4):
+        series = [cumulative(parse_days([log["date"] for log in find_logs(5000 + 1000 * seed, seed)]))
+                  for seed in range(users)]
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            run(series, simulations)
+            best = min(best, time.perf_counter() - start)
+        print(f"{users} users, {simulations} simulations x {HORIZON} days: {best * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Size and render time of geocaching_stats.html, SVG vs. WebGL mode.
+
+    uv run python -m bench.geocaching_chart
+
+geocaching_hu_api_viz.report() is run on two users with synthetic find
+histories, exactly as main() runs it on the synced ones: the page has the
+forecast, the Monte Carlo bands and the catch-up table. "svg" is
+GEOCACHING_CHART_MODE=svg (go.Scatter with plain JSON lists), "webgl" is
+GEOCACHING_CHART_MODE=webgl (go.Scattergl, LTTB-downsampled history before
+the last year and base64 typed arrays). The time covers the whole report.
+Browser render time (until the chart is laid out) is measured when
+Playwright with Chromium is available.
+"""
+import io
+import os
+import re
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Every run renders; reusing the previous build would skip what is measured
+os.environ.setdefault("BUILD_CACHE_DIR", "")
+
+import geocaching_hu_api_viz  # noqa: E402
+from bench.datasets import find_logs  # noqa: E402
+from findlogs import cumulative, parse_days  # noqa: E402
+
+SIZES = (5_000, 50_000, 500_000)
+CONFIG = [(1, "Jómagam"), (2, "Vetélytárs")]
+PLOTLY_CDN = re.compile(r'<script[^>]*src="https://cdn\.plot\.ly/[^"]*"[^>]*></script>')
+
+
+def browser_render_time(path):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return None
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        start = time.perf_counter()
+        page.goto(path.as_uri(), wait_until="load")
+        page.wait_for_function("document.getElementById('geocaching')._fullLayout !== undefined")
+        elapsed = time.perf_counter() - start
+        browser.close()
+    return elapsed
+
+
+def inline_plotlyjs(page):
+    """The page with plotly.js inlined, so that the render time does not depend on the network"""
+    from plotly.offline import get_plotlyjs
+
+    return PLOTLY_CDN.sub(lambda _: f"<script>{get_plotlyjs()}</script>", page, count=1)
+
+
+def main():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            for count in SIZES:
+                results = [cumulative(parse_days([log["date"] for log in find_logs(count, seed)]))
+                           for seed in (0, 1)]
+                days = max(len(d) for d, _ in results)
+                for mode in ("svg", "webgl"):
+                    geocaching_hu_api_viz.CHART_MODE = mode
+                    start = time.perf_counter()
+                    with redirect_stdout(io.StringIO()):
+                        geocaching_hu_api_viz.report(CONFIG, results)
+                    elapsed = time.perf_counter() - start
+                    output = Path(geocaching_hu_api_viz.OUTPUT_FILE)
+                    size = output.stat().st_size
+
+                    path = Path(tmp) / f"{mode}-{count}.html"
+                    path.write_text(inline_plotlyjs(output.read_text(encoding="utf-8")), encoding="utf-8")
+                    render = browser_render_time(path)
+                    render = "n/a" if render is None else f"{render:.2f} s"
+                    print(f"{count:7d} logs, {days:5d} days {mode:>6}: {elapsed:6.3f} s  "
+                          f"{size / 1024:8.1f} KiB  browser {render}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
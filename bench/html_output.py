@@ -0,0 +1,80 @@
+"""
+Generation time and size of sota.html for 100, 1k and 10k activations.
+
+    uv run python -m bench.html_output
+
+"folium" is the previous one-Marker-per-activation generator and is only
+measured when folium is importable. Browser load time (until the cluster
+layer is on the map) is measured when Playwright with Chromium is available.
+"""
+import itertools
+import tempfile
+import time
+from pathlib import Path
+
+from bench.datasets import activations
+from buildcache import BuildCache
+from main import output_to_html
+
+SIZES = (100, 1000, 10000)
+
+
+def folium_html(data, output_filename):
+    import folium
+    from branca.element import Element
+    from unittest.mock import patch
+
+    lats = [a["summit"]["coordinates"]["latitude"] for a in data]
+    lons = [a["summit"]["coordinates"]["longitude"] for a in data]
+    center = (sum(lats)/len(lats), sum(lons)/len(lons))
+    ids = map(lambda i: str(i), itertools.count())
+    with patch.object(Element, '_generate_id', side_effect=ids):
+        m = folium.Map(location=center, zoom_start=8, tiles="OpenStreetMap", control_scale=True, prefer_canvas=True)
+        for a in data:
+            folium.Marker(
+                location=(a["summit"]["coordinates"]["latitude"], a["summit"]["coordinates"]["longitude"]),
+                popup=f'{a["summit"]["code"]} {a["summit"]["name"]} ({a["date"][0:10]})'
+            ).add_to(m)
+        m.save(output_filename)
+
+
+def browser_load_time(path):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return None
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        start = time.perf_counter()
+        page.goto(path.as_uri(), wait_until="load")
+        page.wait_for_function("document.querySelector('.leaflet-marker-pane, .leaflet-overlay-pane canvas') !== null")
+        elapsed = time.perf_counter() - start
+        browser.close()
+    return elapsed
+
+
+def main():
+    # Always render, never reuse a previous build
+    generators = [("template", lambda data, path: output_to_html(data, path, BuildCache("")))]
+    try:
+        import folium  # noqa: F401
+        generators.insert(0, ("folium", folium_html))
+    except ImportError:
+        print("folium not installed, skipping the previous generator")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in SIZES:
+            data = activations(count)
+            for name, generate in generators:
+                path = Path(tmp) / f"{name}-{count}.html"
+                start = time.perf_counter()
+                generate(data, path)
+                elapsed = time.perf_counter() - start
+                load = browser_load_time(path)
+                load = "n/a" if load is None else f"{load:.2f} s"
+                print(f"{count:6d} {name:>8}: {elapsed:7.3f} s  {path.stat().st_size / 1024:9.1f} KiB  browser {load}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+HttpClient's retries and response cache against bench.fakeservices, offline.
+
+    uv run python -m bench.http_client
+
+Each scenario prints the requests the stand-in served by status, the waits
+HttpClient asked for (recorded instead of slept), and fails with an
+AssertionError if the client did not behave as documented:
+
+    retry         first 2 requests 503 + Retry-After: 2, then 200
+    give up       every request 503: retries + 1 attempts, the 503 returned
+    no ttl        two GETs without a ttl: both go to the server
+    ttl fresh     two GETs within the ttl: the second is served from the cache
+    ttl stale     two more GETs with ttl=0: both revalidated, 304, cached body
+"""
+import tempfile
+
+from bench.fakeservices import FakeServices
+from httpclient import HttpClient, ResponseCache
+
+
+def client(cache_dir=None, retries=3):
+    """An HttpClient whose waits are recorded in `client.waits`, not slept"""
+    waits = []
+    cache = ResponseCache(cache_dir) if cache_dir else False
+    c = HttpClient("bench", retries=retries, cache=cache, sleep=waits.append)
+    c.waits = waits
+    return c
+
+
+def scenario(name, services, c):
+    statuses = ", ".join(f"{status} x{n}" for (_, status), n in sorted(services.statuses.items()))
+    waits = ", ".join(f"{w:.2f}" for w in c.waits) or "-"
+    print(f"{name:>10}: {statuses:<20} waits {waits}")
+    services.reset()
+
+
+def main():
+    params = {"callsign": "HA5LA"}
+    with FakeServices(fail_first=2, retry_after=2) as services:
+        url = services.base_url + "/wwa/aw405"
+        with client() as c:
+            response = c.get(url, params=params)
+            assert response.status_code == 200
+            assert len(c.waits) == 2 and all(w >= 2 for w in c.waits)
+            scenario("retry", services, c)
+
+        services.fail_first = 10
+        with client(retries=2) as c:
+            response = c.get(url, params=params)
+            assert response.status_code == 503
+            assert services.requests["wwa"] == 3
+            scenario("give up", services, c)
+
+    with FakeServices(etags=True) as services, tempfile.TemporaryDirectory() as tmp:
+        url = services.base_url + "/wwa/aw405"
+        with client(tmp) as c:
+            first = c.get(url, params=params).content
+            assert c.get(url, params=params).content == first
+            assert services.statuses == {("wwa", 200): 2}
+            scenario("no ttl", services, c)
+
+            c.get(url, params=params, ttl=3600)
+            assert c.get(url, params=params, ttl=3600).content == first
+            assert services.statuses == {("wwa", 200): 1}
+            scenario("ttl fresh", services, c)
+
+            c.get(url, params=params, ttl=0)
+            response = c.get(url, params=params, ttl=0)
+            assert response.status_code == 200 and response.content == first
+            assert services.statuses == {("wwa", 304): 2}
+            scenario("ttl stale", services, c)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Output size and wall time of the PNG optimizer vs postprocess-png.sh.
+
+    uv run python -m bench.png_optimize [map.png]
+
+Without an argument a synthetic map (OSM-like tiles plus markers) is used.
+The shell script is only measured when pngquant and pngcrush are installed.
+With only pngquant, the script's first step is measured instead, an upper
+bound of the script's output size.
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import pngopt
+from bench.datasets import TILE_SIZE, synthetic_tile
+from markers import draw_markers
+
+SCRIPT = Path(__file__).resolve().parent.parent / "postprocess-png.sh"
+
+
+def synthetic_map(cols=6, rows=4, markers=300):
+    img = Image.new("RGB", (cols * TILE_SIZE, rows * TILE_SIZE))
+    for i in range(cols * rows):
+        img.paste(Image.open(BytesIO(synthetic_tile(i))), ((i % cols) * TILE_SIZE, (i // cols) * TILE_SIZE))
+    rng = np.random.default_rng(0)
+    draw_markers(img, rng.integers(0, img.width, markers), rng.integers(0, img.height, markers))
+    return img
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    img = Image.open(sys.argv[1]).convert("RGB") if len(sys.argv) > 1 else synthetic_map()
+    print(f"{img.width}x{img.height} map")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "in.png"
+        img.save(src, format="PNG", compress_level=9)
+        print(f"{'plain compress_level=9':>28}: {src.stat().st_size:9d} bytes")
+
+        if shutil.which("pngquant") and shutil.which("pngcrush"):
+            dst = Path(tmp) / "out.png"
+            _, elapsed = timed(lambda: subprocess.run(
+                ["sh", str(SCRIPT), str(src), str(dst)], check=True, capture_output=True
+            ))
+            print(f"{'postprocess-png.sh':>28}: {dst.stat().st_size:9d} bytes {elapsed:7.2f} s")
+        elif shutil.which("pngquant"):
+            dst = Path(tmp) / "out.png"
+            _, elapsed = timed(lambda: subprocess.run(
+                ["pngquant", "-o", str(dst), str(src)], check=True, capture_output=True
+            ))
+            print(f"{'pngquant only (no pngcrush)':>28}: {dst.stat().st_size:9d} bytes {elapsed:7.2f} s")
+        else:
+            print(f"{'postprocess-png.sh':>28}: skipped, pngquant/pngcrush not installed")
+
+    for trials in (1, 2, len(pngopt.FILTERS)):
+        data, elapsed = timed(lambda: pngopt.optimize(img, trials=trials))
+        check = np.asarray(Image.open(BytesIO(data)).convert("RGB"))
+        error = np.abs(check.astype(int) - np.asarray(img, dtype=int)).mean()
+        print(f"{f'pngopt.optimize trials={trials}':>28}: {len(data):9d} bytes {elapsed:7.2f} s"
+              f"  (mean abs error {error:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Cold-start import time per entry point, from `python -X importtime`.
+
+    uv run python -m bench.startup [REPEAT]
+
+Every entry point is imported together with what it loads lazily on its way
+through main(), i.e. what a full run pays for imports before doing any work.
+"main.py html" is `python main.py html`, which skips the static map. Each
+figure is the best of REPEAT fresh interpreters, followed by the heaviest
+direct dependencies (ms, cumulative) of that run.
+"""
+import subprocess
+import sys
+
+# (label, entry module, modules it imports lazily when run)
+ENTRY_POINTS = [
+    ("main.py html", "main", []),
+    ("main.py", "main", ["staticmap"]),
+    ("wwa.py", "wwa", ["bs4"]),
+    ("geocaching_hu_api_viz.py", "geocaching_hu_api_viz", ["plotly.graph_objects"]),
+]
+TOP = 5
+
+
+def importtime(modules):
+    """
+    Imports of a fresh interpreter as `{name: cumulative_us}` for the
+    top-level ones and for their direct dependencies.
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    top, direct = {}, {}
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        depth = (len(fields[2]) - len(fields[2].lstrip()) - 1) // 2
+        if depth <= 1:
+            (top if depth == 0 else direct)[fields[2].strip()] = int(fields[1])
+    return top, direct
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = importtime([])[0]
+    for label, module, deferred in ENTRY_POINTS:
+        runs = [importtime([module] + deferred) for _ in range(repeat)]
+        totals = [sum(t for name, t in top.items() if name not in baseline) for top, _ in runs]
+        best = min(range(repeat), key=totals.__getitem__)
+        heaviest = sorted(((t, name) for name, t in runs[best][1].items()), reverse=True)[:TOP]
+        print(f"{label:>26}: {totals[best] / 1000:7.1f} ms  "
+              + ", ".join(f"{name} {t / 1000:.0f}" for t, name in heaviest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Timing and memory of the report hot paths on synthetic data, offline.
+
+    uv run python -m bench.suite [--quick] [--latency MS] [--repeat N]
+
+Every HTTP request goes to bench.fakeservices, which delays its responses by
+the given latency (default 0, so that the numbers measure this code and not the
+network). The OSM politeness limits (TILE_RPS) do not apply to the local
+stand-in. Each figure is the best wall time of N runs, and the peak of the
+Python heap (tracemalloc, including NumPy buffers but not Pillow images)
+of one more run. Inputs are seeded, so runs are comparable across commits.
+
+    output_to_png      100 .. 50k activations, cold and warm tile cache, and
+                       warm at 0.25x, 1x and 2x from one mosaic
+    output_to_html     100 .. 50k activations
+    parse_finds_data   1k .. 500k find logs
+    resample_step      1k .. 500k find logs onto the weekly chart grid
+    fetch_stats        WWA pages with 1 .. 5k result rows
+    save_badges        one badge with 1k .. 1M earlier results in the history
+
+--quick only runs the two smallest sizes of each.
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Read at import time by the modules under test
+os.environ.setdefault("TILE_RPS", "0")
+os.environ.setdefault("TILE_WORKERS", "8")
+os.environ.setdefault("HTTP_CACHE_DIR", "")
+os.environ.setdefault("HTTP_RETRIES", "0")
+# Every run renders; reusing the previous build would skip what is measured
+os.environ.setdefault("BUILD_CACHE_DIR", "")
+
+from bench.datasets import activations, find_logs  # noqa: E402
+from bench.fakeservices import FakeServices  # noqa: E402
+
+ACTIVATIONS = (100, 1000, 10_000, 50_000)
+FIND_LOGS = (1000, 10_000, 100_000, 500_000)
+WWA_ROWS = (1, 100, 5000)
+WWA_HISTORY = (1000, 100_000, 1_000_000)
+
+
+def measure(fn, setup=None, repeat=3):
+    """
+    Best wall time of `repeat` runs and the traced peak of one more; `setup`
+    is untimed. The progress output of `fn` is discarded.
+    """
+    best = float("inf")
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def report(name, size, unit, best, peak, note=""):
+    print(f"{name:>18} {size:7d} {unit:<5} {best * 1000:9.1f} ms  peak {peak / 1e6:7.1f} MB  {note}".rstrip())
+
+
+def bench_png(services, sizes, repeat):
+    import staticmap
+
+    staticmap.TILE_URL = services.tile_url
+
+    def clear(*dirs):
+        return lambda: [shutil.rmtree(d, ignore_errors=True) for d in dirs]
+
+    for count in sizes:
+        data = activations(count)
+        run = lambda: staticmap.output_to_png(data, "sota.png")  # noqa: E731
+        # Cold: empty tile cache, every tile comes from the stand-in
+        best, peak = measure(run, clear("tile_cache", "render_state"), repeat)
+        report("output_to_png", count, "acts", best, peak, "cold")
+        # Warm: tiles from the cache, no previous render to reuse
+        best, peak = measure(run, clear("render_state"), repeat)
+        report("output_to_png", count, "acts", best, peak, f"warm, {Path('sota.png').stat().st_size / 1024:.0f} KiB")
+        # The thumbnail/standard/retina set, tiles from the cache
+        pyramid = lambda: staticmap.output_to_png(data, "sota.png", scales=(0.25, 1, 2))  # noqa: E731
+        best, peak = measure(pyramid, clear("render_state"), repeat)
+        report("output_to_png", count, "acts", best, peak, "warm, 0.25x + 1x + 2x")
+
+
+def bench_html(sizes, repeat):
+    from main import output_to_html
+
+    for count in sizes:
+        data = activations(count)
+        best, peak = measure(lambda: output_to_html(data, "sota.html"), repeat=repeat)
+        report("output_to_html", count, "acts", best, peak, f"{Path('sota.html').stat().st_size / 1024:.0f} KiB")
+
+
+def bench_finds(sizes, repeat):
+    from geocaching_hu_api_viz import parse_finds_data
+    from resample import date_grid, resample_step
+
+    for count in sizes:
+        # What fetch_user_logs hands over: the date strings
+        data = [log["date"] for log in find_logs(count)]
+        best, peak = measure(lambda: parse_finds_data(data), repeat=repeat)
+        report("parse_finds_data", count, "logs", best, peak)
+
+        days, totals = parse_finds_data(data)
+        grid = date_grid(days[0], days[-1])
+        best, peak = measure(lambda: resample_step(grid, [(days, totals)])[0], repeat=repeat)
+        report("resample_step", count, "logs", best, peak, f"{len(days)} days, {len(grid)} grid points")
+
+
+def bench_wwa(services, sizes, repeat):
+    import wwa
+    from httpclient import HttpClient
+
+    wwa.URL = services.wwa_url
+    with HttpClient(wwa.USER_AGENT) as client:
+        for rows in sizes:
+            services.wwa_rows = rows
+            services.wwa.cache_clear()
+            best, peak = measure(lambda: wwa.fetch_stats("HA5LA", client), repeat=repeat)
+            report("fetch_stats", rows, "rows", best, peak, f"{len(services.wwa('HA5LA')) / 1024:.0f} KiB")
+
+
+def bench_wwa_history(sizes, repeat):
+    import wwa
+    from wwastore import StatsHistory
+
+    period = wwa.PERIODS[0]
+    for size in sizes:
+        history = StatsHistory(f"wwa_history-{size}.sqlite")
+        # Other callsigns' rows around the badge's own, as in a club's store
+        history.db.executemany(
+            "INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"HA{i % 50}XX", period[0], float(i), i, 2 * i, 1 + i % 97) for i in range(size))
+        )
+        history.db.commit()
+        results = [("HA7XX", period, (1, 2, 3))]
+        best, peak = measure(lambda: wwa.save_badges(results, history), repeat=repeat)
+        history.close()
+        report("save_badges", size, "rows", best, peak, f"{Path(f'wwa_history-{size}.sqlite').stat().st_size / 1e6:.0f} MB")
+
+
+def main():
+    args = sys.argv[1:]
+    quick = "--quick" in args
+    latency = float(args[args.index("--latency") + 1]) / 1000 if "--latency" in args else 0.0
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 3
+
+    def sizes(all_sizes):
+        return all_sizes[:2] if quick else all_sizes
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeServices(latency=latency) as services:
+        # Caches, render state and outputs are created relative to the working directory
+        os.chdir(tmp)
+        try:
+            bench_png(services, sizes(ACTIVATIONS), repeat)
+            bench_html(sizes(ACTIVATIONS), repeat)
+            bench_finds(sizes(FIND_LOGS), repeat)
+            bench_wwa(services, sizes(WWA_ROWS), repeat)
+            bench_wwa_history(sizes(WWA_HISTORY), repeat)
+        finally:
+            os.chdir(cwd)
+        print(f"requests served: {', '.join(f'{k} {v}' for k, v in sorted(services.requests.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Per-tile cost of turning cached/downloaded PNG bytes into the mosaic.
+
+    uv run python -m bench.tile_decode [TILES]
+
+"before" is the old get_tile path: decode, re-encode on a miss, then
+`.convert("RGB")` and paste. "after" pastes the decoded tile straight into
+the RGB mosaic.
+"""
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from bench.datasets import TILE_SIZE, synthetic_tile
+
+
+def before(tiles, mosaic, miss):
+    for i, data in enumerate(tiles):
+        tile = Image.open(BytesIO(data))
+        if miss:
+            tile.save(BytesIO(), format="PNG")
+        else:
+            tile = tile.convert("RGB")
+        mosaic.paste(tile, ((i % 20) * TILE_SIZE, (i // 20) * TILE_SIZE))
+
+
+def after(tiles, mosaic, miss):
+    for i, data in enumerate(tiles):
+        mosaic.paste(Image.open(BytesIO(data)), ((i % 20) * TILE_SIZE, (i // 20) * TILE_SIZE))
+
+
+def measure(fn, tiles, miss, repeat=5):
+    mosaic = Image.new("RGB", (20 * TILE_SIZE, (len(tiles) // 20 + 1) * TILE_SIZE))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(tiles, mosaic, miss)
+        best = min(best, time.perf_counter() - start)
+    return mosaic, best / len(tiles) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    tiles = [synthetic_tile(i) for i in range(count)]
+    print(f"{count} tiles, {sum(map(len, tiles)) / count / 1024:.1f} KiB average")
+    for miss in (False, True):
+        ref, t_before = measure(before, tiles, miss)
+        out, t_after = measure(after, tiles, miss)
+        assert ref.tobytes() == out.tobytes()
+        label = "miss" if miss else "hit"
+        print(f"{label:>4}: before {t_before:7.1f} us/tile  after {t_after:7.1f} us/tile  ({t_before / t_after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
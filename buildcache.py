@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import metrics
+
+# Fingerprints and copies of the last build of every artifact; "" disables
+# the cache and every report is rebuilt
+BUILD_CACHE_DIR = os.getenv("BUILD_CACHE_DIR", "build_cache")
+HERE = Path(__file__).resolve().parent
+
+
+def fingerprint(*parts):
+    """
+    SHA-256 over `parts`: bytes as they are, NumPy arrays by dtype, shape and
+    contents, anything else as sorted-key JSON.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif hasattr(part, "tobytes"):
+            data = f"{part.dtype}{part.shape}".encode() + part.tobytes()
+        else:
+            data = json.dumps(part, sort_keys=True, default=str).encode()
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def renderer_version(*sources):
+    """Fingerprint of the renderer's source files (relative to this directory)"""
+    return fingerprint(*((HERE / source).read_bytes() for source in sources))
+
+
+class BuildCache:
+    """
+    Reuse an artifact when its inputs and renderer are unchanged.
+
+    For every artifact `root/<name>.json` holds the fingerprints of the
+    inputs and of the renderer of its last build, `root/<name>` a copy of
+    the artifact. One file per artifact, so that reports rendered in
+    parallel never write the same manifest.
+    """
+
+    def __init__(self, root=BUILD_CACHE_DIR):
+        self.root = Path(root) if root else None
+
+    def _paths(self, output):
+        name = Path(output).name
+        return self.root / f"{name}.json", self.root / name
+
+    def reuse(self, output, inputs, version):
+        """
+        Restore `output` from the last build if `inputs` and `version` (both
+        fingerprints) match it; logs the decision either way.
+        """
+        if self.root is None:
+            return False
+        manifest_path, copy_path = self._paths(output)
+        try:
+            entry = json.loads(manifest_path.read_text())
+        except (FileNotFoundError, ValueError):
+            entry = None
+
+        if entry is None:
+            reason = "no previous build"
+        elif entry.get("version") != version:
+            reason = "renderer changed"
+        elif entry.get("inputs") != inputs:
+            reason = "inputs changed"
+        elif not copy_path.exists():
+            reason = "previous artifact missing"
+        else:
+            shutil.copyfile(copy_path, output)
+            print(f"Build cache: {output} unchanged since {time.strftime('%Y-%m-%d %H:%M', time.gmtime(entry['built']))} UTC, reused")
+            metrics.count("build.reused")
+            return True
+
+        print(f"Build cache: rebuilding {output} ({reason})")
+        metrics.count("build.rebuilt")
+        return False
+
+    def store(self, output, inputs, version):
+        """Record a fresh build of `output`"""
+        if self.root is None:
+            return
+        manifest_path, copy_path = self._paths(output)
+        self.root.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(output, copy_path)
+        entry = {"inputs": inputs, "version": version, "built": time.time()}
+        manifest_path.write_text(json.dumps(entry, indent=2) + "\n")
@@ -0,0 +1,79 @@
+import codecs
+import json
+import re
+
+import numpy as np
+
+SEPARATOR = re.compile(r"[ \t\r\n,]*")
+WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of a JSON array of objects from an iterable of byte
+    chunks, without materializing the whole document.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    started = False
+
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            pos = (SEPARATOR if started else WHITESPACE).match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Element continues in the next chunk
+                break
+            yield item
+            pos = end
+
+    raise ValueError("Truncated JSON array")
+
+
+def parse_days(date_strings, warn=print):
+    """
+    `"YYYY-MM-DD HH:MM:SS"` strings to a `datetime64[D]` array in one
+    vectorized conversion; unparsable entries are reported and dropped.
+    """
+    # Fixed-width unicode truncates to the date part
+    prefixes = np.array(date_strings, dtype="U10")
+    try:
+        days = prefixes.astype("datetime64[D]")
+    except ValueError:
+        days = np.empty(len(prefixes), dtype="datetime64[D]")
+        for i, prefix in enumerate(prefixes):
+            try:
+                days[i] = np.datetime64(prefix, "D")
+            except ValueError:
+                days[i] = np.datetime64("NaT")
+
+    bad = np.isnat(days)
+    for i in np.flatnonzero(bad):
+        warn(date_strings[i])
+    return days[~bad]
+
+
+def daily_counts(days):
+    """Sorted unique days and the number of finds on each"""
+    return np.unique(days, return_counts=True)
+
+
+def cumulative(days):
+    """Sorted unique days and the running find total at the end of each"""
+    unique, counts = daily_counts(days)
+    return unique, np.cumsum(counts)
@@ -0,0 +1,63 @@
+import numpy as np
+
+from resample import resample_step
+
+# Percentiles of the simulated totals drawn as bands: outer and inner pair
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def recent_daily_finds(series, end, window):
+    """
+    Finds per calendar day (zero days included) over the `window` days ending
+    on `end`, for every `(days, totals)` series: shape `(len(series), window)`.
+    """
+    end = np.datetime64(end, "D")
+    grid = np.arange(end - np.timedelta64(window, "D"), end + np.timedelta64(1, "D"))
+    return np.diff(resample_step(grid, series), axis=1)
+
+
+def simulate(daily, horizon, simulations, seed=None):
+    """
+    Bootstrap future trajectories from observed daily find counts.
+
+    Every future day of every simulation draws one day from the user's own
+    recent window. Returns the finds added since today, shape
+    `(users, simulations, horizon)`; column `d` is the end of day `d + 1`.
+    """
+    daily = np.asarray(daily, dtype=np.int32)
+    users, window = daily.shape
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, window, size=(users, simulations, horizon), dtype=np.int32)
+    draws = np.take_along_axis(daily[:, None, :], picks.reshape(users, 1, -1), axis=2)
+    return np.cumsum(draws.reshape(users, simulations, horizon), axis=2, dtype=np.int32)
+
+
+def percentile_bands(now, paths, columns, q=BAND_PERCENTILES):
+    """
+    Percentiles of the simulated totals on the given day `columns`: shape
+    `(len(q), users, len(columns))`, `now` being the current totals.
+    """
+    added = np.percentile(paths[:, :, columns], q, axis=1)
+    return np.asarray(now)[None, :, None] + added
+
+
+def catch_days(chaser_now, chaser_paths, leader_now, leader_paths):
+    """
+    Day (1 = tomorrow) on which the chaser reaches the leader, per
+    simulation; -1 when it does not happen within the horizon.
+    """
+    gap = (leader_now - chaser_now) + (leader_paths - chaser_paths)
+    caught = gap <= 0
+    return np.where(caught.any(axis=1), caught.argmax(axis=1) + 1, -1)
+
+
+def catch_summary(days, q=(10, 50, 90)):
+    """
+    `(probability, percentiles)` of a `catch_days` result. Percentiles are
+    taken over all simulations, so the ones falling on a non-catching
+    simulation are None.
+    """
+    never = days < 0
+    ordered = np.sort(np.where(never, np.iinfo(np.int64).max, days))
+    picks = ordered[np.clip(np.ceil(np.asarray(q) / 100 * len(days)).astype(int) - 1, 0, len(days) - 1)]
+    return float(1 - never.mean()), [None if p == np.iinfo(np.int64).max else int(p) for p in picks]
@@ -1,55 +1,107 @@
-import requests
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from scipy import stats
+from buildcache import BuildCache, fingerprint, renderer_version
+from datetime import timedelta
 import numpy as np
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from httpclient import HttpClient
+from findlogs import cumulative, daily_counts, iter_json_array, parse_days
+from forecast import catch_days, catch_summary, percentile_bands, recent_daily_finds, simulate
+from logstore import LogStore
+import metrics
+from resample import date_grid, downsample_recent, lead_lag_text, resample_step
+import html
 import os
 import sys
 
 # ========== BEÁLLÍTÁSOK ==========
-# Felhasználók ID-i környezeti változókból
-USER_ID_1 = os.environ.get('GEOCACHING_HU_UID')
-USER_ID_2 = os.environ.get('GEOCACHING_HU_NEMESIS_UID')
-
-# Ellenőrzés, hogy be vannak-e állítva a környezeti változók
-if not USER_ID_1 or not USER_ID_2:
-    print("❌ HIBA: Hiányzó környezeti változók!")
-    print("\nKérlek állítsd be a következő környezeti változókat:")
-    print("  - GEOCACHING_HU_UID (saját geocaching.hu user ID)")
-    print("  - GEOCACHING_HU_NEMESIS_UID (vetélytárs geocaching.hu user ID)")
-    print("\nPéldák:")
-    print("  Linux/Mac: export GEOCACHING_HU_UID=12345")
-    print("  Windows:   set GEOCACHING_HU_UID=12345")
-    print("  GitHub Actions: secrets.GEOCACHING_HU_UID")
-    sys.exit(1)
-
-# Konvertálás integer-re
-try:
-    USER_ID_1 = int(USER_ID_1)
-    USER_ID_2 = int(USER_ID_2)
-except ValueError:
-    print("❌ HIBA: A környezeti változók értékének számnak kell lennie!")
-    sys.exit(1)
-
-USER_NAME_1 = "Jómagam"
-USER_NAME_2 = "Vetélytárs"
+# A felhasználók ID-it a load_users() olvassa be a környezeti változókból
+
+# Felhasználónkénti színek és jelölők (körbeforgatva, ha több a felhasználó)
+COLORS = ['#2E86AB', '#A23B72', '#F18F01', '#3B8B5A', '#C73E1D',
+          '#6C4AB6', '#8D6E63', '#118AB2', '#E76F51', '#4A4E69']
+SYMBOLS = ['circle', 'square', 'diamond', 'triangle-up', 'cross',
+           'x', 'pentagon', 'hexagon', 'star-triangle-up', 'hourglass']
+
+# Egyidejű API lekérések maximális száma
+MAX_WORKERS = 8
 
 # Trend számítás beállítása
 RECENT_DAYS = 90  # Hány nap adatait használja a trend becsléséhez (30, 60, 90, 180, stb.)
 
+# Monte Carlo előrejelzés: a jövőbeli napok találatszámát az utolsó
+# RECENT_DAYS nap napi értékeiből húzzuk (bootstrap), MC_SIMULATIONS pályán
+MC_SIMULATIONS = 10000
+MC_SEED = 0  # Rögzített mag, hogy a kimenet futásról futásra azonos legyen
+
 # Kimenet beállítása
 OUTPUT_FILE = "geocaching_stats.html"  # Kimeneti fájl neve
 
+# Grafikon mód: 'svg', 'webgl' vagy 'auto' (webgl, ha bármelyik felhasználónak
+# LARGE_HISTORY_DAYS-nál több találati napja van). Webgl módban a látható
+# vonalak a legutóbbi FULL_RES_DAYS napot leszámítva LTTB_POINTS pontra
+# ritkulnak, a tömbök pedig bináris (base64) formában kerülnek a HTML-be.
+CHART_MODE = os.environ.get('GEOCACHING_CHART_MODE', 'auto')
+LARGE_HISTORY_DAYS = 3000
+LTTB_POINTS = 500
+FULL_RES_DAYS = 365
+
 # API beállítások
-API_URL = "https://api.geocaching.hu/logsbyuser"
+API_URL = os.environ.get('GEOCACHING_API_URL', "https://api.geocaching.hu/logsbyuser")
 # ==================================
 
-def get_user_finds(user_id):
+def load_users():
     """
-    Lekéri egy felhasználó megtalálásait a geocaching.hu API-ból.
+    A felhasználók (ID, név) párjai a környezeti változókból; hiányzó vagy
+    hibás beállítás esetén kilép. Tetszőleges számú vetélytárs:
+      GEOCACHING_HU_UIDS="12345:Jómagam,23456:Vetélytárs,34567"  (az első a saját)
+    vagy a régi páros:
+      GEOCACHING_HU_UID + GEOCACHING_HU_NEMESIS_UID
     """
-    print(f"Felhasználó {user_id} adatainak lekérése...")
+    user_ids = os.environ.get('GEOCACHING_HU_UIDS')
+    if not user_ids and os.environ.get('GEOCACHING_HU_UID') and os.environ.get('GEOCACHING_HU_NEMESIS_UID'):
+        user_ids = f"{os.environ['GEOCACHING_HU_UID']}:Jómagam,{os.environ['GEOCACHING_HU_NEMESIS_UID']}:Vetélytárs"
+
+    # Ellenőrzés, hogy be vannak-e állítva a környezeti változók
+    if not user_ids or ',' not in user_ids:
+        print("❌ HIBA: Hiányzó környezeti változók!")
+        print("\nKérlek állítsd be a következő környezeti változókat:")
+        print("  - GEOCACHING_HU_UID (saját geocaching.hu user ID)")
+        print("  - GEOCACHING_HU_NEMESIS_UID (vetélytárs geocaching.hu user ID)")
+        print("  vagy")
+        print("  - GEOCACHING_HU_UIDS (vesszővel elválasztva, az első a saját ID)")
+        print("\nPéldák:")
+        print("  Linux/Mac: export GEOCACHING_HU_UID=12345")
+        print("  Windows:   set GEOCACHING_HU_UID=12345")
+        print("  Több vetélytárs: export GEOCACHING_HU_UIDS=12345:Jómagam,23456:Béla,34567:Anna")
+        print("  GitHub Actions: secrets.GEOCACHING_HU_UID")
+        sys.exit(1)
+
+    # Konvertálás (ID, név) párokra
+    try:
+        users = []
+        for i, entry in enumerate(user_ids.split(',')):
+            uid, _, name = entry.strip().partition(':')
+            users.append((int(uid), name or ("Jómagam" if i == 0 else f"Vetélytárs {i}")))
+    except ValueError:
+        print("❌ HIBA: A környezeti változók értékének számnak kell lennie!")
+        sys.exit(1)
+    return users
+
+def full_resync_requested(argv=()):
+    """
+    A helyi napló-tároló alapból csak a legutóbb tárolt nap óta érkezett
+    logokat dolgozza fel. Teljes újraszinkronizálás: --full-resync vagy
+    GEOCACHING_FULL_RESYNC=1.
+    """
+    return '--full-resync' in argv or os.environ.get('GEOCACHING_FULL_RESYNC') == '1'
+
+def fetch_user_logs(user_id, client=None):
+    """
+    Lekéri egy felhasználó megtalálási logjainak dátumait a geocaching.hu
+    API-ból. Hiba esetén None-t ad vissza.
+    """
+    if client is None:
+        with HttpClient() as client:
+            return fetch_user_logs(user_id, client)
 
     params = {
         'userid': user_id,
@@ -58,64 +110,117 @@ def get_user_finds(user_id):
     }
 
     try:
-        response = requests.get(API_URL, params=params, timeout=15)
+        # Átmeneti hibáknál a kliens újrapróbálkozik. Válasz-gyorsítótár (ttl)
+        # nélkül kérjük, hogy a folyamos feldolgozás megmaradjon; a helyi
+        # napló-tároló úgyis csak az új napokat írja.
+        response = client.get(API_URL, params=params, timeout=15, stream=True)
 
         if response.status_code == 200:
-            data = response.json()
-            print(f"  ✓ Sikeresen lekérve: {len(data)} találat")
-            return parse_finds_data(data)
+            # A választ folyamában dolgozzuk fel, csak a dátumokat tartjuk meg
+            with response, metrics.span("geocaching.logs_stream"):
+                data = [item['date'] for item in iter_json_array(response.iter_content(65536))
+                        if 'date' in item]
+            metrics.count("http.bytes", response.raw.tell())
+            metrics.count("geocaching.logs", len(data))
+            print(f"  ✓ Felhasználó {user_id}: sikeresen lekérve {len(data)} találat")
+            return data
         else:
-            print(f"  ✗ Hiba: HTTP {response.status_code}")
+            print(f"  ✗ Felhasználó {user_id}: HTTP {response.status_code}")
             print(f"     {response.text[:200]}")
             return None
 
     except Exception as e:
-        print(f"  ✗ Hiba történt: {e}")
+        print(f"  ✗ Felhasználó {user_id}: hiba történt: {e}")
+        return None
+
+def process_user_logs(user_id, data, store=None, full_resync=False):
+    """
+    Feldolgozza a log dátumokat; ha `store` meg van adva, a helyi tárolót is
+    frissíti (`full_resync` esetén a teljes előzményt újraírja).
+    Eredmény: (napok, kumulatív találatok) tömbpár vagy None.
+    """
+    if data is None:
         return None
+    with metrics.span("geocaching.parse"):
+        if store is not None:
+            return sync_user_finds(store, user_id, parse_dates(data), full_resync)
+        return parse_finds_data(data)
+
+def get_user_finds(user_id, store=None, full_resync=False):
+    """
+    Lekéri egy felhasználó megtalálásait a geocaching.hu API-ból.
+    Ha `store` meg van adva, a helyi tárolót is frissíti.
+    """
+    print(f"Felhasználó {user_id} adatainak lekérése...")
+    return process_user_logs(user_id, fetch_user_logs(user_id), store, full_resync)
+
+def get_all_user_finds(user_ids, store=None, full_resync=False):
+    """
+    Párhuzamosan lekéri több felhasználó megtalálásait egy közös
+    (connection pool-os) klienssel; a feldolgozás sorban történik.
+    """
+    print(f"{len(user_ids)} felhasználó adatainak lekérése...")
+    workers = max(1, min(MAX_WORKERS, len(user_ids)))
+    with HttpClient(pool_size=workers) as client:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            logs = list(pool.map(lambda uid: fetch_user_logs(uid, client), user_ids))
+    return [process_user_logs(uid, data, store, full_resync) for uid, data in zip(user_ids, logs)]
+
+def parse_dates(data):
+    """A dátum stringeket datetime64[D] tömbbé alakítja (egy lépésben)."""
+    return parse_days(
+        data, warn=lambda d: print(f"  Figyelmeztetés: Nem sikerült feldolgozni dátumot: {d}")
+    )
 
 def parse_finds_data(data):
     """
-    Feldolgozza az API válaszát és kinyeri a dátum-találat párokat.
+    Feldolgozza az API válaszának dátumait és kiszámolja a napi kumulatív
+    találatszámot: (napok, kumulatív találatok) tömbpár.
     """
     if not data or not isinstance(data, list):
         return None
 
-    # Találatok csoportosítása dátum szerint
-    finds_by_date = defaultdict(int)
-
-    for item in data:
-        if 'date' in item:
-            date_str = item['date']
-            try:
-                # Formátum: "2025-10-16 11:12:00"
-                date = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-                date_only = date.strftime('%Y-%m-%d')
-                finds_by_date[date_only] += 1
-            except Exception as e:
-                print(f"  Figyelmeztetés: Nem sikerült feldolgozni dátumot: {date_str}")
-                continue
-
-    if not finds_by_date:
+    days = parse_dates(data)
+
+    if len(days) == 0:
         return None
 
     # Rendezés és kumulatív számítás
-    sorted_dates = sorted(finds_by_date.keys())
-    result = []
-    total = 0
+    return cumulative(days)
 
-    for date_str in sorted_dates:
-        total += finds_by_date[date_str]
-        result.append((date_str, total))
+def sync_user_finds(store, user_id, days, full_resync=False):
+    """
+    Frissíti a helyi tárolót a logok napjai alapján, és visszaadja a
+    (napok, kumulatív találatok) tömbpárt.
 
-    return result
+    Csak a legutóbb tárolt naptól kezdődő logokat dolgozza fel; ha a korábbi
+    logok száma nem egyezik a tárolttal, teljes újraszinkronizálást végez.
+    """
+    if len(days) == 0:
+        return None
 
-def convert_to_plot_data(data_list):
-    """Dátum stringeket datetime objektummá konvertál."""
-    if not data_list:
+    tail = None if full_resync else store.tail(user_id)
+    if tail is not None:
+        since, stored_before = tail
+        recent = days >= since
+        if len(days) - np.count_nonzero(recent) == stored_before:
+            unique, counts = daily_counts(days[recent])
+            print(f"  ✓ Növekményes frissítés {since} óta: {counts.sum()} találat")
+            store.replace_from(user_id, since, unique, counts)
+            return store.series(user_id)
+        print("  Figyelmeztetés: a tárolt napló eltér az API adataitól, teljes újraszinkronizálás")
+
+    unique, counts = daily_counts(days)
+    store.replace_from(user_id, None, unique, counts)
+    return store.series(user_id)
+
+def convert_to_plot_data(data):
+    """A (napok, kumulatív találatok) tömbpárt datetime és int listává alakítja."""
+    if data is None or len(data[0]) == 0:
         return [], []
 
-    dates = [datetime.strptime(d[0], '%Y-%m-%d') for d in data_list]
-    counts = [d[1] for d in data_list]
+    dates = data[0].astype('datetime64[us]').tolist()
+    counts = data[1].tolist()
     return dates, counts
 
 def linear_regression(dates, counts, recent_days=90):
@@ -138,9 +243,12 @@ def linear_regression(dates, counts, recent_days=90):
     recent_counts = [counts[i] for i in recent_indices]
 
     # Regresszió a kiválasztott időszakra
-    x = np.array([(d - recent_dates[0]).days for d in recent_dates])
-    y = np.array(recent_counts)
-    slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
+    # (legkisebb négyzetek, ugyanúgy számolva, mint a scipy.stats.linregress)
+    x = np.array([(d - recent_dates[0]).days for d in recent_dates], dtype=float)
+    y = np.array(recent_counts, dtype=float)
+    x -= x.mean()
+    y -= y.mean()
+    slope = (x @ y / len(x)) / (x @ x / len(x))
 
     # Az intercept-et úgy állítjuk be, hogy illeszkedjen az utolsó ismert ponthoz
     days_from_first = (dates[-1] - dates[0]).days
@@ -181,322 +289,438 @@ def predict_counts(dates, slope, intercept, base_date, future_dates):
         predictions.append(max(0, slope * days + intercept))
     return predictions
 
-# ========== ADATOK LEKÉRÉSE ==========
-print("=" * 60)
-print("GEOCACHING.HU STATISZTIKÁK")
-print("=" * 60)
-print()
-
-data1 = get_user_finds(USER_ID_1)
-data2 = get_user_finds(USER_ID_2)
-
-if data1 is None or data2 is None:
-    print("\n❌ Nem sikerült lekérni az adatokat!")
-    print("\nEllenőrizd:")
-    print("  - A felhasználói ID-k helyesek?")
-    print("  - Van internet kapcsolat?")
-    print("  - Az API elérhető? (https://api.geocaching.hu)")
-    exit(1)
-
-dates1, counts1 = convert_to_plot_data(data1)
-dates2, counts2 = convert_to_plot_data(data2)
-
-if not dates1 or not dates2:
-    print("\n❌ Nem sikerült feldolgozni az adatokat!")
-    exit(1)
-
-# Legutóbbi megtalálás dátuma (ez lesz a "mai" nap)
-current_date = max(dates1[-1], dates2[-1])
-
-# ========== TREND SZÁMÍTÁS ==========
-slope1, intercept1 = linear_regression(dates1, counts1, RECENT_DAYS)
-slope2, intercept2 = linear_regression(dates2, counts2, RECENT_DAYS)
-
-# Jövőbeli predikció (1 év)
-future_days = 365
-last_date = current_date
-future_dates = [last_date + timedelta(days=i) for i in range(0, future_days, 30)]
-
-pred1 = predict_counts(dates1, slope1, intercept1, dates1[0], future_dates)
-pred2 = predict_counts(dates2, slope2, intercept2, dates2[0], future_dates)
-
-# Utolérés kiszámítása
-catch_date, can_catch = predict_catch_date(
-    dates1, counts1, slope1, intercept1,
-    dates2, counts2, slope2, intercept2
-)
-
-# ========== PLOTLY GRAFIKON ==========
-fig = go.Figure()
-
-# Közös időskála létrehozása (hetente 1 pont az interpolációhoz)
-start_date = min(dates1[0], dates2[0])
-end_date = max(dates1[-1], dates2[-1])
-all_dates = []
-current = start_date
-while current <= end_date:
-    all_dates.append(current)
-    current += timedelta(days=7)  # Hetente 1 pont a fájlméret csökkentéséhez
-# Az utolsó nap mindenképp legyen benne
-if all_dates[-1] != end_date:
-    all_dates.append(end_date)
-
-# Interpolált értékek számítása mindkét felhasználóhoz
-def interpolate_values(dates, counts, all_dates):
-    result = []
-    for target_date in all_dates:
-        # Megkeressük a legutolsó ismert értéket
-        val = 0
-        for i, d in enumerate(dates):
-            if d <= target_date:
-                val = counts[i]
-            else:
-                break
-        result.append(val)
-    return result
-
-interp_counts1 = interpolate_values(dates1, counts1, all_dates)
-interp_counts2 = interpolate_values(dates2, counts2, all_dates)
-
-# Különbségek számítása
-diff_text = []
-
-for i in range(len(all_dates)):
-    val1 = interp_counts1[i]
-    val2 = interp_counts2[i]
-    
-    diff = val2 - val1
-    
-    if val2 > 0:
-        pct = (diff / val2) * 100
-    else:
-        pct = 0
-    
-    if diff > 0:
-        diff_text.append(f'Lemaradás: {diff} ({pct:.1f}%)')
-    elif diff < 0:
-        diff_text.append(f'Előny: {abs(diff)} ({abs(pct):.1f}%)')
-    else:
-        diff_text.append('Holtverseny')
-
-# Láthatatlan trace a különbség megjelenítésére
-fig.add_trace(go.Scatter(
-    x=all_dates,
-    y=[0] * len(all_dates),
-    mode='lines',
-    name='Különbség',
-    line=dict(width=0),
-    hovertemplate='<b>%{text}</b><extra></extra>',
-    text=diff_text,
-    showlegend=False,
-    yaxis='y2'
-))
-
-# Interpolált adatok - Személy 1 (láthatatlan, csak hoverhez)
-fig.add_trace(go.Scatter(
-    x=all_dates,
-    y=interp_counts1,
-    mode='lines',
-    name=f'{USER_NAME_1}',
-    line=dict(color='#2E86AB', width=0),
-    hovertemplate='%{y} találat<extra></extra>',
-    showlegend=False
-))
-
-# Interpolált adatok - Személy 2 (láthatatlan, csak hoverhez)
-fig.add_trace(go.Scatter(
-    x=all_dates,
-    y=interp_counts2,
-    mode='lines',
-    name=f'{USER_NAME_2}',
-    line=dict(color='#A23B72', width=0),
-    hovertemplate='%{y} találat<extra></extra>',
-    showlegend=False
-))
-
-# Látható adatok - Személy 1 (csak a tényleges pontok)
-fig.add_trace(go.Scatter(
-    x=dates1,
-    y=counts1,
-    mode='lines+markers',
-    name=f'{USER_NAME_1}',
-    line=dict(color='#2E86AB', width=3),
-    marker=dict(size=8, symbol='circle'),
-    hoverinfo='skip'
-))
-
-# Látható adatok - Személy 2 (csak a tényleges pontok)
-fig.add_trace(go.Scatter(
-    x=dates2,
-    y=counts2,
-    mode='lines+markers',
-    name=f'{USER_NAME_2}',
-    line=dict(color='#A23B72', width=3),
-    marker=dict(size=8, symbol='square'),
-    hoverinfo='skip'
-))
-
-# Jövőbeli becslés - Személy 1
-fig.add_trace(go.Scatter(
-    x=future_dates,
-    y=pred1,
-    mode='lines',
-    name=f'{USER_NAME_1} (becslés)',
-    line=dict(color='#2E86AB', width=2, dash='dash'),
-    opacity=0.6,
-    hovertemplate='~%{y:.0f} találat<extra></extra>'
-))
-
-# Jövőbeli becslés - Személy 2
-fig.add_trace(go.Scatter(
-    x=future_dates,
-    y=pred2,
-    mode='lines',
-    name=f'{USER_NAME_2} (becslés)',
-    line=dict(color='#A23B72', width=2, dash='dash'),
-    opacity=0.6,
-    hovertemplate='~%{y:.0f} találat<extra></extra>'
-))
-
-# Utolérési pont
-if can_catch and catch_date < future_dates[-1]:
-    catch_count = slope1 * (catch_date - dates1[0]).days + intercept1
-    fig.add_trace(go.Scatter(
-        x=[catch_date],
-        y=[catch_count],
-        mode='markers',
-        name=f'🎯 Utolérés',
-        marker=dict(size=20, color='green', symbol='star', line=dict(color='darkgreen', width=2)),
-        hovertemplate=f'Utolérés: {catch_date.strftime("%Y-%m-%d")}<br>{catch_count:.0f} találat<extra></extra>',
-        showlegend=True
+def fetch_finds(config, full_resync=False):
+    """
+    Lekéri és a helyi tárolóba szinkronizálja a felhasználók találatait
+    (`full_resync` esetén teljesen újra); ha valamelyik nem sikerül, kilép.
+    """
+    # ========== ADATOK LEKÉRÉSE ==========
+    print("=" * 60)
+    print("GEOCACHING.HU STATISZTIKÁK")
+    print("=" * 60)
+    print()
+
+    store = LogStore()
+    results = get_all_user_finds([uid for uid, _ in config], store, full_resync)
+    store.close()
+
+    if any(data is None for data in results):
+        print("\n❌ Nem sikerült lekérni az adatokat!")
+        print("\nEllenőrizd:")
+        print("  - A felhasználói ID-k helyesek?")
+        print("  - Van internet kapcsolat?")
+        print("  - Az API elérhető? (https://api.geocaching.hu)")
+        sys.exit(1)
+    return results
+
+def write_chart(users, current_date, future_dates, catch_table, band_dates, bands, catch_cell, mc_cell):
+    """A Plotly grafikon és az utolérési táblázat, OUTPUT_FILE-ba írva."""
+    me = users[0]
+    rivals = users[1:]
+
+    # ========== PLOTLY GRAFIKON ==========
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+
+    large = CHART_MODE == 'webgl' or (
+        CHART_MODE == 'auto' and max(len(u['days']) for u in users) > LARGE_HISTORY_DAYS
+    )
+    Trace = go.Scattergl if large else go.Scatter
+
+    def plot_x(days):
+        """Webgl módban ezredmásodperc 1970 óta (typed array), különben datetime lista."""
+        if large:
+            return days.astype('datetime64[ms]').astype(np.float64)
+        return days.astype('datetime64[us]').tolist()
+
+    # Közös időskála létrehozása (hetente 1 pont a fájlméret csökkentéséhez,
+    # az utolsó nap mindenképp benne van)
+    grid = date_grid(min(u['days'][0] for u in users), max(u['days'][-1] for u in users))
+    all_dates = plot_x(grid)
+
+    # Lépcsős (utolsó ismert érték) mintavételezés minden felhasználóra egyszerre
+    interp = resample_step(grid, [(u['days'], u['totals']) for u in users])
+    for u, values in zip(users, interp):
+        u['interp'] = values if large else values.tolist()
+
+    # Különbségek számítása minden vetélytárshoz képest
+    labels = [lead_lag_text(interp[0], values) for values in interp[1:]]
+    if len(rivals) > 1:
+        labels = [np.char.add(f"{r['name']}: ", text) for r, text in zip(rivals, labels)]
+    diff_text = labels[0]
+    for text in labels[1:]:
+        diff_text = np.char.add(np.char.add(diff_text, '<br>'), text)
+    diff_text = diff_text.tolist()
+
+    # Láthatatlan trace a különbség megjelenítésére
+    fig.add_trace(Trace(
+        x=all_dates,
+        y=np.zeros(len(all_dates), dtype=np.int8) if large else [0] * len(all_dates),
+        mode='lines',
+        name='Különbség',
+        line=dict(width=0),
+        hovertemplate='<b>%{text}</b><extra></extra>',
+        text=diff_text,
+        showlegend=False,
+        yaxis='y2'
     ))
 
-    # Függőleges vonal az utolérési pontnál
-    fig.add_vline(x=catch_date, line_dash="dot", line_color="green", opacity=0.5)
-
-# Legutóbbi megtalálás dátuma
-fig.add_vline(
-    x=current_date,
-    line_dash="dash",
-    line_color="red",
-    opacity=0.5
-)
-
-fig.add_annotation(
-    x=current_date,
-    y=1,
-    yref="paper",
-    text=f"Legutóbbi: {current_date.strftime('%Y-%m-%d')}",
-    showarrow=False,
-    yshift=10,
-    font=dict(color="red")
-)
-
-# Layout beállítások
-fig.update_layout(
-    title={
-        'text': 'Geocaching találatok összehasonlítása (geocaching.hu)',
-        'x': 0.5,
-        'xanchor': 'center',
-        'font': {'size': 20, 'family': 'Arial, sans-serif'}
-    },
-    xaxis_title='Dátum',
-    yaxis_title='Találatok száma',
-    hovermode='x unified',
-    template='plotly_white',
-    legend=dict(
-        orientation="v",
-        yanchor="top",
-        y=0.99,
-        xanchor="left",
-        x=0.01,
-        bgcolor="rgba(255, 255, 255, 0.8)",
-        bordercolor="gray",
-        borderwidth=1
-    ),
-    height=700,
-    font=dict(size=12),
-    yaxis2=dict(
-        overlaying='y',
-        side='right',
-        showgrid=False,
-        showticklabels=False,
-        range=[0, 1]
+    # Interpolált adatok (láthatatlan, csak hoverhez)
+    for u in users:
+        fig.add_trace(Trace(
+            x=all_dates,
+            y=u['interp'],
+            mode='lines',
+            name=f"{u['name']}",
+            line=dict(color=u['color'], width=0),
+            hovertemplate='%{y} találat<extra></extra>',
+            showlegend=False
+        ))
+
+    # Látható adatok (csak a tényleges pontok)
+    for u in users:
+        if large:
+            # A régi szakasz ritkítva, a legutóbbi időszak teljes felbontásban
+            idx = downsample_recent(u['days'], u['totals'], LTTB_POINTS,
+                                    np.datetime64(current_date, 'D') - np.timedelta64(FULL_RES_DAYS, 'D'))
+            x, y = plot_x(u['days'][idx]), u['totals'][idx]
+        else:
+            x, y = u['dates'], u['counts']
+        fig.add_trace(Trace(
+            x=x,
+            y=y,
+            mode='lines+markers',
+            name=f"{u['name']}",
+            line=dict(color=u['color'], width=3),
+            marker=dict(size=8, symbol=u['symbol']),
+            hoverinfo='skip'
+        ))
+
+    # Jövőbeli becslés
+    for u in users:
+        fig.add_trace(go.Scatter(
+            x=future_dates,
+            y=u['pred'],
+            mode='lines',
+            name=f"{u['name']} (becslés)",
+            line=dict(color=u['color'], width=2, dash='dash'),
+            opacity=0.6,
+            hovertemplate='~%{y:.0f} találat<extra></extra>'
+        ))
+
+    # Monte Carlo sávok: 5–95% és 25–75% (a belső sötétebb)
+    def rgba(color, alpha):
+        r, g, b = (int(color[k:k + 2], 16) for k in (1, 3, 5))
+        return f'rgba({r}, {g}, {b}, {alpha})'
+
+    for i, u in enumerate(users):
+        for k, (low, high) in enumerate([(0, 4), (1, 3)]):
+            fig.add_trace(go.Scatter(
+                x=band_dates, y=bands[high, i], mode='lines', line=dict(width=0),
+                legendgroup=f"mc-{u['id']}", showlegend=False, hoverinfo='skip'
+            ))
+            fig.add_trace(go.Scatter(
+                x=band_dates, y=bands[low, i], mode='lines', line=dict(width=0),
+                fill='tonexty', fillcolor=rgba(u['color'], 0.12 if k == 0 else 0.2),
+                name=f"{u['name']} (szimuláció, 5–95%)", legendgroup=f"mc-{u['id']}",
+                showlegend=k == 0, hoverinfo='skip'
+            ))
+
+    # Utolérési pontok (saját magunk vs. vetélytársak)
+    for r in rivals:
+        catch_date, can_catch = catch_table[(me['id'], r['id'])]
+        if can_catch and catch_date < future_dates[-1]:
+            catch_count = me['slope'] * (catch_date - me['dates'][0]).days + me['intercept']
+            fig.add_trace(go.Scatter(
+                x=[catch_date],
+                y=[catch_count],
+                mode='markers',
+                name=f'🎯 Utolérés: {r["name"]}' if len(rivals) > 1 else f'🎯 Utolérés',
+                marker=dict(size=20, color='green', symbol='star', line=dict(color='darkgreen', width=2)),
+                hovertemplate=f'Utolérés: {catch_date.strftime("%Y-%m-%d")}<br>{catch_count:.0f} találat<extra></extra>',
+                showlegend=True
+            ))
+
+            # Függőleges vonal az utolérési pontnál
+            fig.add_vline(x=catch_date, line_dash="dot", line_color="green", opacity=0.5)
+
+    # Legutóbbi megtalálás dátuma
+    fig.add_vline(
+        x=current_date,
+        line_dash="dash",
+        line_color="red",
+        opacity=0.5
+    )
+
+    fig.add_annotation(
+        x=current_date,
+        y=1,
+        yref="paper",
+        text=f"Legutóbbi: {current_date.strftime('%Y-%m-%d')}",
+        showarrow=False,
+        yshift=10,
+        font=dict(color="red")
     )
-)
-
-# Rács beállítása
-fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
-fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
-
-# HTML mentése
-fig.write_html(OUTPUT_FILE, 
-               config={'displayModeBar': True, 'displaylogo': False},
-               include_plotlyjs='cdn',
-               div_id='geocaching')
-print(f"\n✅ Interaktív grafikon mentve: {OUTPUT_FILE}")
-
-# ========== STATISZTIKÁK ==========
-print("\n" + "=" * 60)
-print("RÉSZLETES STATISZTIKÁK")
-print("=" * 60)
-print(f"\n⚙️  Trend becslés az utolsó {RECENT_DAYS} nap alapján")
-
-print(f"\n👤 {USER_NAME_1} (ID: {USER_ID_1}):")
-print(f"   Jelenlegi találatok: {counts1[-1]}")
-print(f"   Első találat: {dates1[0].strftime('%Y-%m-%d')}")
-print(f"   Utolsó találat: {dates1[-1].strftime('%Y-%m-%d')}")
-print(f"   Aktív napok: {(dates1[-1] - dates1[0]).days} nap")
-print(f"   Átlagos tempó: {slope1:.2f} találat/nap")
-print(f"                  {slope1*7:.1f} találat/hét")
-print(f"                  {slope1*30:.1f} találat/hónap")
-
-print(f"\n👤 {USER_NAME_2} (ID: {USER_ID_2}):")
-print(f"   Jelenlegi találatok: {counts2[-1]}")
-print(f"   Első találat: {dates2[0].strftime('%Y-%m-%d')}")
-print(f"   Utolsó találat: {dates2[-1].strftime('%Y-%m-%d')}")
-print(f"   Aktív napok: {(dates2[-1] - dates2[0]).days} nap")
-print(f"   Átlagos tempó: {slope2:.2f} találat/nap")
-print(f"                  {slope2*7:.1f} találat/hét")
-print(f"                  {slope2*30:.1f} találat/hónap")
-
-diff = counts2[-1] - counts1[-1]
-if diff > 0:
-    print(f"\n📊 Jelenlegi lemaradás: {diff} találat")
-    print(f"   Ez {diff/counts2[-1]*100:.1f}%-a a {USER_NAME_2} találatainak")
-elif diff < 0:
-    print(f"\n🎉 Jelenleg {abs(diff)} találattal vezetsz!")
-else:
-    print(f"\n🤝 Pontosan ugyanannyi találatotok van!")
-
-if can_catch:
-    days_diff = int((catch_date - current_date).days)
-    months_diff = days_diff / 30
-    print(f"\n🎯 KIVÁLÓ HÍR! A jelenlegi tempóval utol fogod érni!")
-    print(f"   📅 Becsült dátum: {catch_date.strftime('%Y. %B %d.')}")
-    print(f"   ⏱️  Időtáv: {days_diff} nap ({months_diff:.1f} hónap)")
-
-    catch_count = int(slope1 * (catch_date - dates1[0]).days + intercept1)
-    print(f"   🏆 Akkor várhatóan kb. {catch_count} találatod lesz")
-
-    needed_finds = catch_count - counts1[-1]
-    print(f"   📈 Ehhez még {needed_finds} találatra van szükség")
-
-elif counts1[-1] >= counts2[-1]:
-    print(f"\n🏆 Gratulálok, már megelőzted a cimborádat!")
-else:
-    print(f"\n⚠️  A jelenlegi tempóval sajnos nem éred utol.")
-    print(f"   A {USER_NAME_2} gyorsabb tempóban gyűjt ({slope2:.2f} vs {slope1:.2f} találat/nap)")
-
-    needed_slope = slope2 + (diff / ((dates1[-1] - dates1[0]).days))
-    daily_increase = needed_slope - slope1
-    print(f"   Az utoléréshez legalább {needed_slope:.2f} találat/nap kell")
-    print(f"   Ez napi {daily_increase:.2f} találattal több a jelenleginél")
-
-print("=" * 60)
-
-print(f"\n✅ Sikeres futás!")
-print(f"📊 Interaktív grafikon: {OUTPUT_FILE}")
-print(f"📅 Referencia dátum: {current_date.strftime('%Y-%m-%d')} (legutóbbi megtalálás)")
-print(f"🖱️  Nyisd meg böngészőben és húzd az egeret az adatpontok fölé!")
-print(f"💡 TIP: Használd GitHub Actions-ben napi futáshoz!")
\ No newline at end of file
+
+    # Layout beállítások
+    fig.update_layout(
+        title={
+            'text': 'Geocaching találatok összehasonlítása (geocaching.hu)',
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {'size': 20, 'family': 'Arial, sans-serif'}
+        },
+        xaxis_title='Dátum',
+        yaxis_title='Találatok száma',
+        hovermode='x unified',
+        template='plotly_white',
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor="rgba(255, 255, 255, 0.8)",
+            bordercolor="gray",
+            borderwidth=1
+        ),
+        height=700,
+        font=dict(size=12),
+        yaxis2=dict(
+            overlaying='y',
+            side='right',
+            showgrid=False,
+            showticklabels=False,
+            range=[0, 1]
+        )
+    )
+
+    # Rács beállítása (webgl módban az x tengely számokat kap, ezért dátum típusú)
+    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    if large:
+        fig.update_xaxes(type='date')
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
+
+    def catch_table_html(users):
+        header = ''.join(f'<th>{html.escape(u["name"])}</th>' for u in users)
+        rows = []
+        for chaser in users:
+            cells = ''.join(
+                '<td>—</td>' if chaser is leader else
+                f'<td>{catch_cell(chaser, leader)}</td>' if chaser['counts'][-1] >= leader['counts'][-1] else
+                f'<td>{catch_cell(chaser, leader)}<br><small>{mc_cell(chaser, leader)}</small></td>'
+                for leader in users
+            )
+            rows.append(f'<tr><th>{html.escape(chaser["name"])}</th>{cells}</tr>')
+        return (
+            '<style>#catch-up { font-family: Arial, sans-serif; margin: 20px }'
+            ' #catch-up table { border-collapse: collapse }'
+            ' #catch-up th, #catch-up td { border: 1px solid lightgray; padding: 4px 8px; text-align: center }</style>'
+            '<div id="catch-up">'
+            f'<h3>Várható utolérés (az utolsó {RECENT_DAYS} nap tempója alapján)</h3>'
+            f'<p><small>Apró betűvel: az utolérés esélye {MC_SIMULATIONS} szimulált év alapján</small></p>'
+            f'<table><tr><th>Ki \\ kit</th>{header}</tr>'
+            + ''.join(rows) +
+            '</table></div>'
+        )
+
+    # HTML mentése
+    with metrics.span("geocaching.to_html"):
+        page = fig.to_html(config={'displayModeBar': True, 'displaylogo': False},
+                           include_plotlyjs='cdn',
+                           div_id='geocaching')
+    page = page.replace('</body>', catch_table_html(users) + '\n</body>')
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        f.write(page)
+
+
+def report(config, results, build_cache=None):
+    """
+    Grafikon, utolérési táblázat és statisztikák a lekért adatokból. Ha sem
+    az adatok, sem a kód nem változott, az előző grafikont használja újra; a
+    statisztikákat ekkor is kiírja.
+    """
+    from importlib.metadata import version as package_version
+
+    build_cache = BuildCache() if build_cache is None else build_cache
+    inputs = fingerprint(config, CHART_MODE, package_version('plotly'),
+                         *(array for data in results for array in data))
+    version = renderer_version("geocaching_hu_api_viz.py", "forecast.py", "resample.py")
+    reused = build_cache.reuse(OUTPUT_FILE, inputs, version)
+
+    users = []
+    for i, ((uid, name), data) in enumerate(zip(config, results)):
+        dates, counts = convert_to_plot_data(data)
+        users.append({
+            'id': uid,
+            'name': name,
+            'days': data[0],
+            'totals': data[1],
+            'dates': dates,
+            'counts': counts,
+            'color': COLORS[i % len(COLORS)],
+            'symbol': SYMBOLS[i % len(SYMBOLS)],
+        })
+
+    if not all(u['dates'] for u in users):
+        print("\n❌ Nem sikerült feldolgozni az adatokat!")
+        sys.exit(1)
+
+    me = users[0]
+    rivals = users[1:]
+
+    # Legutóbbi megtalálás dátuma (ez lesz a "mai" nap)
+    current_date = max(u['dates'][-1] for u in users)
+
+    # ========== TREND SZÁMÍTÁS ==========
+    # Jövőbeli predikció (1 év)
+    future_days = 365
+    last_date = current_date
+    future_dates = [last_date + timedelta(days=i) for i in range(0, future_days, 30)]
+
+    for u in users:
+        u['slope'], u['intercept'] = linear_regression(u['dates'], u['counts'], RECENT_DAYS)
+        u['pred'] = predict_counts(u['dates'], u['slope'], u['intercept'], u['dates'][0], future_dates)
+
+    # Utolérés kiszámítása minden párra: ki (sor) éri utol kit (oszlop)
+    catch_table = {}
+    for chaser in users:
+        for leader in users:
+            if chaser is not leader:
+                catch_table[(chaser['id'], leader['id'])] = predict_catch_date(
+                    chaser['dates'], chaser['counts'], chaser['slope'], chaser['intercept'],
+                    leader['dates'], leader['counts'], leader['slope'], leader['intercept']
+                )
+
+    # Monte Carlo szimuláció minden felhasználóra egyszerre
+    today = np.datetime64(current_date, 'D')
+    daily = recent_daily_finds([(u['days'], u['totals']) for u in users], today, RECENT_DAYS)
+    with metrics.span("geocaching.forecast"):
+        paths = simulate(daily, future_days, MC_SIMULATIONS, MC_SEED)
+    now = np.array([u['counts'][-1] for u in users])
+
+    # Sávok hetente, a mai nappal kezdve
+    band_columns = np.arange(6, future_days, 7)
+    band_dates = [current_date] + (today + (band_columns + 1).astype('timedelta64[D]')).astype('datetime64[us]').tolist()
+    bands = percentile_bands(now, paths, band_columns)
+    bands = np.concatenate([np.broadcast_to(now[:, None], bands.shape[:2] + (1,)), bands], axis=2)
+
+    mc_catch = {}
+    for i, chaser in enumerate(users):
+        for j, leader in enumerate(users):
+            if chaser is not leader:
+                mc_catch[(chaser['id'], leader['id'])] = catch_summary(
+                    catch_days(now[i], paths[i], now[j], paths[j])
+                )
+    del paths
+
+    # Utolérési táblázat: a sor felhasználója mikor éri utol az oszlopét
+    def catch_cell(chaser, leader):
+        if chaser['counts'][-1] >= leader['counts'][-1]:
+            return 'már előtte'
+        catch_date, can_catch = catch_table[(chaser['id'], leader['id'])]
+        if can_catch:
+            return catch_date.strftime('%Y-%m-%d')
+        return 'nem éri utol'
+
+    def mc_cell(chaser, leader):
+        """A szimulált utolérés valószínűsége és medián dátuma."""
+        probability, (p10, p50, p90) = mc_catch[(chaser['id'], leader['id'])]
+        text = f'{probability * 100:.0f}% egy éven belül'
+        if p50 is not None:
+            text += f', medián: {(current_date + timedelta(days=p50)).strftime("%Y-%m-%d")}'
+        return text
+
+    if not reused:
+        write_chart(users, current_date, future_dates, catch_table, band_dates, bands, catch_cell, mc_cell)
+        build_cache.store(OUTPUT_FILE, inputs, version)
+        print(f"\n✅ Interaktív grafikon mentve: {OUTPUT_FILE}")
+    metrics.value("output.geocaching_html.bytes", os.path.getsize(OUTPUT_FILE))
+
+    # ========== STATISZTIKÁK ==========
+    print("\n" + "=" * 60)
+    print("RÉSZLETES STATISZTIKÁK")
+    print("=" * 60)
+    print(f"\n⚙️  Trend becslés az utolsó {RECENT_DAYS} nap alapján")
+
+    for u in users:
+        print(f"\n👤 {u['name']} (ID: {u['id']}):")
+        print(f"   Jelenlegi találatok: {u['counts'][-1]}")
+        print(f"   Első találat: {u['dates'][0].strftime('%Y-%m-%d')}")
+        print(f"   Utolsó találat: {u['dates'][-1].strftime('%Y-%m-%d')}")
+        print(f"   Aktív napok: {(u['dates'][-1] - u['dates'][0]).days} nap")
+        print(f"   Átlagos tempó: {u['slope']:.2f} találat/nap")
+        print(f"                  {u['slope']*7:.1f} találat/hét")
+        print(f"                  {u['slope']*30:.1f} találat/hónap")
+
+    for r in rivals:
+        if len(rivals) > 1:
+            print(f"\n--- {me['name']} vs. {r['name']} ---")
+
+        diff = r['counts'][-1] - me['counts'][-1]
+        if diff > 0:
+            print(f"\n📊 Jelenlegi lemaradás: {diff} találat")
+            print(f"   Ez {diff/r['counts'][-1]*100:.1f}%-a a {r['name']} találatainak")
+        elif diff < 0:
+            print(f"\n🎉 Jelenleg {abs(diff)} találattal vezetsz!")
+        else:
+            print(f"\n🤝 Pontosan ugyanannyi találatotok van!")
+
+        catch_date, can_catch = catch_table[(me['id'], r['id'])]
+        if can_catch:
+            days_diff = int((catch_date - current_date).days)
+            months_diff = days_diff / 30
+            print(f"\n🎯 KIVÁLÓ HÍR! A jelenlegi tempóval utol fogod érni!")
+            print(f"   📅 Becsült dátum: {catch_date.strftime('%Y. %B %d.')}")
+            print(f"   ⏱️  Időtáv: {days_diff} nap ({months_diff:.1f} hónap)")
+
+            catch_count = int(me['slope'] * (catch_date - me['dates'][0]).days + me['intercept'])
+            print(f"   🏆 Akkor várhatóan kb. {catch_count} találatod lesz")
+
+            needed_finds = catch_count - me['counts'][-1]
+            print(f"   📈 Ehhez még {needed_finds} találatra van szükség")
+
+        elif me['counts'][-1] >= r['counts'][-1]:
+            print(f"\n🏆 Gratulálok, már megelőzted a cimborádat!")
+            continue
+        else:
+            print(f"\n⚠️  A jelenlegi tempóval sajnos nem éred utol.")
+            print(f"   A {r['name']} gyorsabb tempóban gyűjt ({r['slope']:.2f} vs {me['slope']:.2f} találat/nap)")
+
+            needed_slope = r['slope'] + (diff / ((me['dates'][-1] - me['dates'][0]).days))
+            daily_increase = needed_slope - me['slope']
+            print(f"   Az utoléréshez legalább {needed_slope:.2f} találat/nap kell")
+            print(f"   Ez napi {daily_increase:.2f} találattal több a jelenleginél")
+
+        probability, (p10, p50, p90) = mc_catch[(me['id'], r['id'])]
+        print(f"\n🎲 Szimuláció ({MC_SIMULATIONS} pálya): {probability * 100:.0f}% eséllyel egy éven belül")
+        if p50 is not None:
+            dates = [(current_date + timedelta(days=d)).strftime('%Y-%m-%d') if d is not None else 'később'
+                     for d in (p10, p50, p90)]
+            print(f"   Medián: {dates[1]} (10–90%: {dates[0]} – {dates[2]})")
+
+    if len(users) > 2:
+        print("\n📋 Várható utolérések (ki → kit):")
+        for chaser in users:
+            for leader in users:
+                if chaser is not leader and chaser['counts'][-1] < leader['counts'][-1]:
+                    print(f"   {chaser['name']} → {leader['name']}: {catch_cell(chaser, leader)}")
+
+    print("=" * 60)
+
+    print(f"\n✅ Sikeres futás!")
+    print(f"📊 Interaktív grafikon: {OUTPUT_FILE}")
+    print(f"📅 Referencia dátum: {current_date.strftime('%Y-%m-%d')} (legutóbbi megtalálás)")
+    print(f"🖱️  Nyisd meg böngészőben és húzd az egeret az adatpontok fölé!")
+    print(f"💡 TIP: Használd GitHub Actions-ben napi futáshoz!")
+
+
+def main():
+    with metrics.run("geocaching"):
+        config = load_users()
+        report(config, fetch_finds(config, full_resync_requested(sys.argv[1:])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+
+# Attempts after the first one for connection errors, timeouts and the
+# statuses below; the delay doubles each time, with full jitter
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "1"))
+HTTP_MAX_DELAY = float(os.getenv("HTTP_MAX_DELAY", "60"))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Response cache for GET requests made with a `ttl`; "" disables it
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+
+
+def retry_after(value, now=None):
+    """Seconds to wait from a `Retry-After` header (delta seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(when.timestamp() - now, 0.0)
+
+
+class ResponseCache:
+    """
+    Response bodies of GET requests on disk, keyed by the full URL.
+
+    `root/<sha256>.body` holds the body, `root/<sha256>.json` the URL, the
+    fetch time and the validators (ETag, Last-Modified) for revalidation.
+    """
+
+    def __init__(self, root=HTTP_CACHE_DIR):
+        self.root = Path(root)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.root / f"{key}.json", self.root / f"{key}.body"
+
+    def lookup(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+        return meta if meta.get("url") == url else None, body
+
+    def store(self, url, body, headers):
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta = {"url": url, "fetched": time.time(), "headers": {}}
+        for name in ("ETag", "Last-Modified", "Content-Type"):
+            if headers.get(name):
+                meta["headers"][name] = headers[name]
+        meta_path, body_path = self._paths(url)
+        for path, data in ((body_path, body), (meta_path, json.dumps(meta).encode())):
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+
+    def touch(self, url, meta, headers):
+        """The server answered 304: restart the TTL, keep the body"""
+        if headers.get("ETag"):
+            meta["headers"]["ETag"] = headers["ETag"]
+        meta["fetched"] = time.time()
+        meta_path, _ = self._paths(url)
+        meta_path.write_text(json.dumps(meta))
+
+
+class HttpClient:
+    """
+    One pooled `requests.Session` with retries and an optional response cache.
+
+    Transient failures (connection errors, timeouts, 429 and 5xx) are retried
+    with jittered exponential backoff, waiting at least as long as the
+    server's `Retry-After` asks. GET requests given a `ttl` are served from
+    the cache while younger than `ttl` seconds, then revalidated with
+    If-None-Match/If-Modified-Since.
+    """
+
+    def __init__(self, user_agent=None, pool_size=10, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF,
+                 max_delay=HTTP_MAX_DELAY, cache=None, sleep=time.sleep):
+        self.session = requests.Session()
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        if cache is None and HTTP_CACHE_DIR:
+            cache = ResponseCache()
+        self.cache = cache or None
+        self.sleep = sleep
+
+    def delay(self, attempt, response=None):
+        """Full jitter backoff, or the server's Retry-After if that is longer"""
+        delay = random.uniform(0, min(self.backoff * 2 ** attempt, self.max_delay))
+        if response is not None:
+            delay = max(delay, min(retry_after(response.headers.get("Retry-After")) or 0, self.max_delay))
+        return delay
+
+    def request(self, method, url, **kwargs):
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            if attempt:
+                metrics.count("http.retries")
+            try:
+                with metrics.span("http.request"):
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                self.sleep(self.delay(attempt))
+                continue
+            metrics.count("http.requests")
+            if not kwargs.get("stream"):
+                # Streamed bodies are counted by the caller once read
+                metrics.count("http.bytes", len(response.content))
+            if response.status_code not in RETRY_STATUSES or last:
+                return response
+            response.close()
+            self.sleep(self.delay(attempt, response))
+
+    def get(self, url, params=None, ttl=None, **kwargs):
+        """GET with retries; with a `ttl` (seconds) and a cache, served from or revalidated against it"""
+        if ttl is None or self.cache is None:
+            return self.request("GET", url, params=params, **kwargs)
+
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        meta, body = self.cache.lookup(full_url) or (None, None)
+        if meta is not None and time.time() - meta["fetched"] < ttl:
+            metrics.count("http.cache.fresh")
+            return self.cached_response(full_url, meta, body)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta is not None:
+            if meta["headers"].get("ETag"):
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+        # The body is stored, so it is read in full even for stream=True
+        kwargs.pop("stream", None)
+        response = self.request("GET", full_url, headers=headers, **kwargs)
+
+        if meta is not None and response.status_code == 304:
+            metrics.count("http.cache.revalidated")
+            self.cache.touch(full_url, meta, response.headers)
+            return self.cached_response(full_url, meta, body)
+        if response.status_code == 200:
+            self.cache.store(full_url, response.content, response.headers)
+        return response
+
+    @staticmethod
+    def cached_response(url, meta, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response._content = body
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
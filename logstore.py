@@ -0,0 +1,73 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+from sqlitedb import open_versioned_db
+
+LOG_STORE_PATH = Path(os.getenv("GEOCACHING_LOG_STORE", "geocaching_logs.sqlite"))
+# The finds are synced again from the API after a layout change
+SCHEMA_VERSION = 1
+
+
+class LogStore:
+    """
+    Per-user daily find counts with their cumulative totals, in SQLite.
+
+    Days are stored as integer days since 1970-01-01. Rows are only ever
+    rewritten from a given day onwards, so a sync touches the tail of the
+    history and leaves the cumulative totals before it alone.
+    """
+
+    def __init__(self, path=LOG_STORE_PATH):
+        self.path = Path(path)
+        self.db = open_versioned_db(self.path, SCHEMA_VERSION, """
+            CREATE TABLE IF NOT EXISTS finds (
+                user_id INTEGER, day INTEGER, count INTEGER, total INTEGER,
+                PRIMARY KEY (user_id, day)
+            );
+        """, rebuild=["finds"])
+
+    def tail(self, user_id):
+        """`(last_day, total_before_last_day)` of a user, or None if unknown"""
+        row = self.db.execute(
+            "SELECT day, total - count FROM finds WHERE user_id = ? ORDER BY day DESC LIMIT 1",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return np.datetime64(row[0], "D"), row[1]
+
+    def series(self, user_id):
+        """Cumulative totals: `(days, totals)` arrays in day order"""
+        rows = np.array(self.db.execute(
+            "SELECT day, total FROM finds WHERE user_id = ? ORDER BY day", (user_id,)
+        ).fetchall(), dtype=np.int64).reshape(-1, 2)
+        return rows[:, 0].astype("datetime64[D]"), rows[:, 1]
+
+    def replace_from(self, user_id, since, days, counts):
+        """
+        Replace the days from `since` onwards (all days if None) with the
+        sorted `days`/`counts` arrays and recompute their cumulative totals.
+        """
+        since = -2**62 if since is None else int(since.astype(np.int64))
+        row = self.db.execute(
+            "SELECT total FROM finds WHERE user_id = ? AND day < ? ORDER BY day DESC LIMIT 1",
+            (user_id, since)
+        ).fetchone()
+        base = row[0] if row else 0
+
+        days = days.astype(np.int64)
+        keep = days >= since
+        days, counts = days[keep], np.asarray(counts)[keep]
+        totals = base + np.cumsum(counts)
+
+        with self.db:
+            self.db.execute("DELETE FROM finds WHERE user_id = ? AND day >= ?", (user_id, since))
+            self.db.executemany(
+                "INSERT INTO finds VALUES (?, ?, ?, ?)",
+                zip([user_id] * len(days), days.tolist(), counts.tolist(), totals.tolist())
+            )
+
+    def close(self):
+        self.db.close()
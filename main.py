@@ -1,208 +1,127 @@
-import folium
-import itertools
-import math
-import mercantile
+import json
+import metrics
 import os
-import requests
-import time
-from PIL import Image, ImageDraw
-from PIL.PngImagePlugin import PngInfo
-from branca.element import Element
-from io import BytesIO
+import sys
+from buildcache import BuildCache, fingerprint, renderer_version
+from httpclient import HttpClient
 from pathlib import Path
-from unittest.mock import patch
+from string import Template
+
+OUTPUTS = ("html", "png")
+
+SOTA_API_URL = os.getenv("SOTA_API_URL", "https://sotl.as/api/activations/{callsign}")
+# Activations change at most a few times a day
+SOTA_CACHE_TTL = 3600
 
 def get_callsign():
     callsign = os.getenv("CALLSIGN")
     return callsign if callsign else os.environ["GITHUB_REPOSITORY_OWNER"]
 
-def fetch_sota_activations():
-    print("fetching sota activations")
-    url = f'https://sotl.as/api/activations/{get_callsign().upper()}'
-    return requests.get(url, timeout=30).json()
+def fetch_sota_activations(client=None):
+    if client is None:
+        with HttpClient() as client:
+            return fetch_sota_activations(client)
 
-def output_to_html(data, output_filename):
+    print("fetching sota activations")
+    url = SOTA_API_URL.format(callsign=get_callsign().upper())
+    with metrics.span("sota.fetch"):
+        resp = client.get(url, ttl=SOTA_CACHE_TTL, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+    metrics.count("sota.activations", len(data))
+    return data
+
+HTML_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>SOTA activations</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<link rel="stylesheet" href="https://unpkg.com/leaflet.markercluster@1.5.3/dist/MarkerCluster.css">
+<link rel="stylesheet" href="https://unpkg.com/leaflet.markercluster@1.5.3/dist/MarkerCluster.Default.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<script src="https://unpkg.com/leaflet.markercluster@1.5.3/dist/leaflet.markercluster.js"></script>
+<style>html, body, #map { width: 100%; height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+// [code, name, date, lat, lon]
+const activations = $activations;
+const map = L.map("map", { preferCanvas: true }).setView([$lat, $lon], 8);
+L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
+  maxZoom: 19,
+  attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+}).addTo(map);
+L.control.scale().addTo(map);
+const style = { radius: 6, color: "black", weight: 1, fillColor: "red", fillOpacity: 0.9 };
+const cluster = L.markerClusterGroup({ chunkedLoading: true });
+cluster.addLayers(activations.map(([code, name, date, lat, lon]) =>
+  L.circleMarker([lat, lon], style).bindPopup(() => {
+    const popup = document.createElement("div");
+    popup.textContent = `$${code} $${name} ($${date})`;
+    return popup;
+  })
+));
+map.addLayer(cluster);
+</script>
+</body>
+</html>
+""")
+
+def output_to_html(data, output_filename, build_cache=None):
+    build_cache = BuildCache() if build_cache is None else build_cache
+    inputs = fingerprint(data)
+    version = renderer_version("main.py")
+    if not build_cache.reuse(output_filename, inputs, version):
+        with metrics.span("html.render"):
+            html = render_html(data)
+        Path(output_filename).write_text(html, encoding="utf-8")
+        build_cache.store(output_filename, inputs, version)
+    metrics.value("output.sota_html.bytes", Path(output_filename).stat().st_size)
+
+def render_html(data):
     # Center map
     lats = [a["summit"]["coordinates"]["latitude"] for a in data]
     lons = [a["summit"]["coordinates"]["longitude"] for a in data]
     center = (sum(lats)/len(lats), sum(lons)/len(lons))
 
-    ids = map(lambda i: str(i), itertools.count())
-
-    with patch.object(Element, '_generate_id', side_effect=ids):
-        # Create map
-        m = folium.Map(
-            location=center,
-            zoom_start=8,
-            tiles="OpenStreetMap",
-            control_scale=True,
-            prefer_canvas=True
-        )
-
-        for a in data:
-            folium.Marker(
-                location=(a["summit"]["coordinates"]["latitude"], a["summit"]["coordinates"]["longitude"]),
-                popup=f'{a["summit"]["code"]} {a["summit"]["name"]} ({a["date"][0:10]})'
-            ).add_to(m)
-
-        m.save(output_filename)
-
-
-def get_tile(z, x, y, session):
-    path = Path("tile_cache") / str(z) / str(x) / f"{y}.png"
-    if path.exists():
-        return Image.open(path).convert("RGB")
-
-    path.parent.mkdir(parents=True, exist_ok=True)
-
-    url = f"https://tile.openstreetmap.org/{z}/{x}/{y}.png"
-    resp = session.get(url, timeout=20)
-    resp.raise_for_status()
-
-    img = Image.open(BytesIO(resp.content))
-    img.save(path, format="PNG")
-
-    return img
-
-def lonlat_to_pixels(lon, lat, zoom):
-    """Convert lon/lat to global pixel coordinates"""
-    siny = math.sin(lat * math.pi / 180.0)
-    siny = min(max(siny, -0.9999), 0.9999)
-
-    scale = 256 * (2 ** zoom)
-    x = (lon + 180.0) / 360.0 * scale
-    y = (0.5 - math.log((1 + siny) / (1 - siny)) / (4 * math.pi)) * scale
-    return x, y
-
-def choose_zoom(points, padding=0.1):
-    TARGET_WIDTH = 1200
-    TARGET_HEIGHT = 800
-    MAX_ZOOM = 12
-    MIN_ZOOM = 4
-    for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
-        xs, ys = zip(*(lonlat_to_pixels(lon, lat, zoom) for lat, lon in points))
-
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
-
-        width = max_x - min_x
-        height = max_y - min_y
-
-        if width <= TARGET_WIDTH and height <= TARGET_HEIGHT:
-            return zoom
-
-    return MIN_ZOOM
-
-def output_to_png(data, output_filename):
-    points = [
-        (
-            a["summit"]["coordinates"]["latitude"],
-            a["summit"]["coordinates"]["longitude"]
-        )
+    activations = [
+        [
+            a["summit"]["code"],
+            a["summit"]["name"],
+            a["date"][0:10],
+            round(a["summit"]["coordinates"]["latitude"], 5),
+            round(a["summit"]["coordinates"]["longitude"], 5),
+        ]
         for a in data
     ]
+    # Compact, and safe to embed in a <script> element
+    payload = json.dumps(activations, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
 
-    if not points:
-        raise RuntimeError("No activation coordinates found")
-
-    points = sorted(points, key=lambda p: (p[0], p[1]))
-
-    lats = [p[0] for p in points]
-    lons = [p[1] for p in points]
-
-    # Add padding around bounds
-    padding = 0.1
-    min_lat, max_lat = min(lats) - padding, max(lats) + padding
-    min_lon, max_lon = min(lons) - padding, max(lons) + padding
-
-    ZOOM = choose_zoom(points)
-    print(f"Using zoom level {ZOOM}")
-
-    # ------------------------------------------------------------
-    # Determine required tiles
-    # ------------------------------------------------------------
-    tiles = list(
-        mercantile.tiles(
-            min_lon, min_lat,
-            max_lon, max_lat,
-            ZOOM
-        )
-    )
-
-    xs = [t.x for t in tiles]
-    ys = [t.y for t in tiles]
-
-    min_x, max_x = min(xs), max(xs)
-    min_y, max_y = min(ys), max(ys)
-
-    TILE_SIZE = 256
-
-    width = (max_x - min_x + 1) * TILE_SIZE
-    height = (max_y - min_y + 1) * TILE_SIZE
-
-    img = Image.new("RGB", (width, height))
-    draw = ImageDraw.Draw(img)
-
-    # ------------------------------------------------------------
-    # Fetch and stitch map tiles
-    # ------------------------------------------------------------
-
-    session = requests.Session()
-    session.headers["User-Agent"] = "SOTA-map-generator/1.0 (ham radio)"
-
-    tiles = sorted(
-        tiles,
-        key=lambda t: (t.y, t.x)
-    )
-
-    for t in tiles:
-        tile = get_tile(t.z, t.x, t.y, session)
-        px = (t.x - min_x) * TILE_SIZE
-        py = (t.y - min_y) * TILE_SIZE
-        img.paste(tile, (px, py))
-
-    # ------------------------------------------------------------
-    # Draw activation markers (FIXED)
-    # ------------------------------------------------------------
-    for lat, lon in points:
-        gx, gy = lonlat_to_pixels(lon, lat, ZOOM)
-
-        px = int(gx - min_x * TILE_SIZE)
-        py = int(gy - min_y * TILE_SIZE)
-
-        MARKER_RADIUS = 4
-        draw.ellipse(
-            (
-                px - MARKER_RADIUS,
-                py - MARKER_RADIUS,
-                px + MARKER_RADIUS,
-                py + MARKER_RADIUS
-            ),
-            fill="red",
-            outline="black"
-        )
-
-    # ------------------------------------------------------------
-    # Save result
-    # ------------------------------------------------------------
-    raw = img.tobytes()
-    stable = Image.frombytes("RGB", img.size, raw)
-    pnginfo = PngInfo()  # EMPTY: no metadata
-    stable.save(
-        output_filename,
-        format="PNG",
-        pngingo=pnginfo,
-        optimize=False,
-        compress_level=9,
-        add_time=False
+    return HTML_TEMPLATE.substitute(
+        activations=payload,
+        lat=round(center[0], 5),
+        lon=round(center[1], 5),
     )
-    print(f"Saved {output_filename}")
 
 
-def main():
-    data = fetch_sota_activations()
-    output_to_html(data, "sota.html")
-    output_to_png(data, "sota.png")
+def main(outputs=None):
+    """Generate the requested outputs (default: all, or the ones named on the command line)"""
+    outputs = outputs or sys.argv[1:] or OUTPUTS
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown:
+        raise SystemExit(f"Unknown output: {', '.join(sorted(unknown))} (choose from {', '.join(OUTPUTS)})")
+
+    with metrics.run("sota"):
+        data = fetch_sota_activations()
+        if "html" in outputs:
+            output_to_html(data, "sota.html")
+        if "png" in outputs:
+            # numpy, Pillow and the tile machinery are only needed for the static map
+            from staticmap import output_to_png
+            output_to_png(data, "sota.png")
 
 
 if __name__ == "__main__":
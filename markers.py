@@ -0,0 +1,117 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+MARKER_RADIUS = 4
+MAX_MARKER_RADIUS = 12
+HEATMAP_CELL = 4
+HEATMAP_BLUR = 6
+
+
+def dedupe_activations(data):
+    """
+    One entry per summit: `(code, lat, lon, count)`, sorted by (lat, lon)
+    like the markers were drawn before.
+    """
+    summits = {}
+    for a in data:
+        s = a["summit"]
+        entry = summits.get(s["code"])
+        if entry is None:
+            summits[s["code"]] = [s["code"], s["coordinates"]["latitude"], s["coordinates"]["longitude"], 1]
+        else:
+            entry[3] += 1
+    return sorted((tuple(e) for e in summits.values()), key=lambda e: (e[1], e[2], e[0]))
+
+
+def marker_sprite(radius=MARKER_RADIUS, fill="red", outline="black"):
+    """RGBA array of a single marker, drawn exactly like ImageDraw.ellipse"""
+    size = 2 * radius + 1
+    sprite = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).ellipse((0, 0, size - 1, size - 1), fill=fill, outline=outline)
+    return np.asarray(sprite)
+
+
+def stamp(overlay, sprite, xs, ys):
+    """Copy the opaque pixels of `sprite` centered on every (xs, ys) into `overlay`"""
+    height, width = overlay.shape[:2]
+    radius = sprite.shape[0] // 2
+    sy, sx = np.nonzero(sprite[..., 3])
+    values = sprite[sy, sx]
+
+    X = xs[:, None] + (sx - radius)[None, :]
+    Y = ys[:, None] + (sy - radius)[None, :]
+    inside = (X >= 0) & (X < width) & (Y >= 0) & (Y < height)
+    overlay[Y[inside], X[inside]] = np.broadcast_to(values, X.shape + (4,))[inside]
+
+
+def marker_radii(counts, sized, scale=1):
+    """Marker radius per point, for an image drawn at `scale` times the base size"""
+    if not sized:
+        radii = np.full(len(counts), MARKER_RADIUS)
+    else:
+        radii = MARKER_RADIUS + np.round(2 * np.log2(np.asarray(counts, dtype=float)))
+        radii = np.minimum(radii, MAX_MARKER_RADIUS)
+    if scale != 1:
+        radii = np.maximum(np.round(radii * scale), 1)
+    return radii.astype(int)
+
+
+def draw_markers(img, xs, ys, counts=None, sized=False, scale=1):
+    """
+    Stamp a marker per point onto `img` in one composite.
+
+    With `sized`, the marker radius grows with the activation count; larger
+    markers are stamped first so small ones stay visible on top. `scale`
+    sizes the markers for an image drawn at that multiple of the base size.
+    """
+    xs = np.asarray(xs, dtype=int)
+    ys = np.asarray(ys, dtype=int)
+    counts = np.ones(len(xs), dtype=int) if counts is None else np.asarray(counts)
+
+    overlay = np.zeros((img.height, img.width, 4), dtype=np.uint8)
+    radii = marker_radii(counts, sized, scale)
+    for radius in sorted(set(radii.tolist()), reverse=True):
+        sel = radii == radius
+        stamp(overlay, marker_sprite(radius), xs[sel], ys[sel])
+
+    layer = Image.fromarray(overlay, "RGBA")
+    img.paste(layer.convert("RGB"), (0, 0), layer.getchannel("A"))
+
+
+def heatmap_ramp():
+    """256-entry transparent-yellow-red color ramp"""
+    t = np.linspace(0.0, 1.0, 256)
+    rgb = np.stack([
+        np.full_like(t, 255),
+        255 * (1 - t) ** 0.7,
+        np.zeros_like(t),
+    ], axis=1)
+    alpha = 220 * np.clip(t * 1.5, 0, 1)
+    return np.column_stack([rgb, alpha]).round().astype(np.uint8)
+
+
+def draw_heatmap(img, xs, ys, counts=None, scale=1):
+    """Alpha-composite an activation density layer over `img`, cells and blur sized by `scale`"""
+    cell = max(round(HEATMAP_CELL * scale), 1)
+    cells_x = -(-img.width // cell)
+    cells_y = -(-img.height // cell)
+    hist, _, _ = np.histogram2d(
+        np.asarray(ys, dtype=float), np.asarray(xs, dtype=float),
+        bins=(cells_y, cells_x),
+        range=((0, cells_y * cell), (0, cells_x * cell)),
+        weights=counts
+    )
+    if not hist.any():
+        return
+
+    density = np.log1p(hist)
+    density = (255 * density / density.max()).astype(np.uint8)
+    level = Image.fromarray(density, "L").resize(
+        (cells_x * cell, cells_y * cell), Image.Resampling.BICUBIC
+    ).crop((0, 0, img.width, img.height)).filter(ImageFilter.GaussianBlur(HEATMAP_BLUR * scale))
+
+    level = np.asarray(level).astype(float)
+    if level.max() > 0:
+        level = level * (255 / level.max())
+    layer = Image.fromarray(heatmap_ramp()[level.astype(np.uint8)], "RGBA")
+    img.paste(layer.convert("RGB"), (0, 0), layer.getchannel("A"))
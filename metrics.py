@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-run metrics are written to METRICS_DIR/<run>.json; unset or "" disables
+# them, and every call below is then a no-op
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+ENABLED = bool(METRICS_DIR)
+
+_lock = threading.Lock()
+# name: [calls, total seconds, max seconds]
+_spans = {}
+_counters = {}
+_values = {}
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            entry = _spans.setdefault(self.name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+        return False
+
+
+def span(name):
+    """Time a block; calls, total and longest duration are aggregated per name"""
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+
+def count(name, n=1):
+    """Add `n` to a counter"""
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def value(name, v):
+    """Set a value, e.g. an output size; the last one wins"""
+    if ENABLED:
+        with _lock:
+            _values[name] = v
+
+
+def peak_rss():
+    """Peak resident set size in bytes of this process and of its waited-for children"""
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS, KiB elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+def snapshot(reset=False):
+    """The metrics recorded so far, as JSON-ready dicts"""
+    with _lock:
+        result = {
+            "spans": {name: {"calls": c, "seconds": round(t, 6), "max_seconds": round(m, 6)}
+                      for name, (c, t, m) in sorted(_spans.items())},
+            "counters": dict(sorted(_counters.items())),
+            "values": dict(sorted(_values.items())),
+        }
+        if reset:
+            _spans.clear()
+            _counters.clear()
+            _values.clear()
+    return result
+
+
+def merge(other):
+    """Add a `snapshot()` taken in another process"""
+    if not ENABLED:
+        return
+    with _lock:
+        for name, s in other["spans"].items():
+            entry = _spans.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += s["calls"]
+            entry[1] += s["seconds"]
+            entry[2] = max(entry[2], s["max_seconds"])
+        for name, n in other["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+        _values.update(other["values"])
+
+
+@contextmanager
+def run(name):
+    """
+    Record a whole run: its wall time, whether it raised, and peak RSS,
+    written with everything else to METRICS_DIR/<name>.json on exit.
+    """
+    if not ENABLED:
+        yield
+        return
+
+    started = time.time()
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        report = {
+            "run": name,
+            "started": started,
+            "seconds": round(time.perf_counter() - start, 6),
+            "ok": ok,
+            "peak_rss_bytes": peak_rss(),
+            **snapshot(),
+        }
+        path = Path(METRICS_DIR) / f"{name}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Metrics: {path}")
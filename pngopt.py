@@ -0,0 +1,121 @@
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+# Exact colors that must survive quantization (markers)
+MARKER_COLORS = ((255, 0, 0), (0, 0, 0))
+FILTERS = ("none", "sub", "up", "average", "paeth", "adaptive")
+STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+# Bound on the search: how many of the best ranked filters get the full
+# level 9 pass with every zlib strategy. Counted rather than timed so that
+# the output does not depend on the machine.
+SEARCH_TRIALS = 1
+
+
+def quantize(img, colors=256, keep=MARKER_COLORS):
+    """
+    Palette-quantize an RGB map without dithering.
+
+    OSM tiles are mostly flat areas, so a median cut palette refined with
+    k-means captures them well; dithering would only add noise that zlib
+    cannot compress. The `keep` colors are forced into the palette so that
+    markers stay their exact color.
+    """
+    base = img.quantize(colors - len(keep), method=Image.Quantize.MEDIANCUT, kmeans=2, dither=Image.Dither.NONE)
+    palette = base.getpalette()[:3 * (colors - len(keep))]
+    for color in keep:
+        palette.extend(color)
+    palette.extend([0] * (768 - len(palette)))
+
+    reference = Image.new("P", (1, 1))
+    reference.putpalette(palette)
+    return img.quantize(palette=reference, dither=Image.Dither.NONE)
+
+
+def filter_rows(pixels, kind):
+    """Apply a PNG filter (1 byte per pixel) and prepend the filter type byte"""
+    cur = pixels.astype(np.int16)
+    up = np.zeros_like(cur)
+    up[1:] = cur[:-1]
+    left = np.zeros_like(cur)
+    left[:, 1:] = cur[:, :-1]
+    upleft = np.zeros_like(cur)
+    upleft[1:, 1:] = cur[:-1, :-1]
+
+    if kind == "adaptive":
+        options = [filter_rows(pixels, k) for k in ("none", "sub", "up", "average", "paeth")]
+        # Minimum sum of absolute differences heuristic, per row
+        cost = np.stack([np.abs(o[:, 1:].astype(np.int8).astype(np.int16)).sum(axis=1) for o in options])
+        best = cost.argmin(axis=0)
+        return np.stack(options)[best, np.arange(len(best))]
+
+    if kind == "none":
+        code, out = 0, cur
+    elif kind == "sub":
+        code, out = 1, cur - left
+    elif kind == "up":
+        code, out = 2, cur - up
+    elif kind == "average":
+        code, out = 3, cur - (left + up) // 2
+    elif kind == "paeth":
+        p = left + up - upleft
+        pa, pb, pc = np.abs(p - left), np.abs(p - up), np.abs(p - upleft)
+        pred = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, upleft))
+        code, out = 4, cur - pred
+    else:
+        raise ValueError(f"Unknown PNG filter: {kind}")
+
+    rows = np.empty((out.shape[0], out.shape[1] + 1), dtype=np.uint8)
+    rows[:, 0] = code
+    rows[:, 1:] = (out & 0xFF).astype(np.uint8)
+    return rows
+
+
+def chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode(pixels, palette, idat):
+    height, width = pixels.shape
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        chunk(b"PLTE", bytes(palette)),
+        chunk(b"IDAT", idat),
+        chunk(b"IEND", b""),
+    ])
+
+
+def optimize(img, trials=SEARCH_TRIALS):
+    """
+    Encode `img` as a small palette PNG and return the bytes.
+
+    All filters are ranked with a quick zlib level 6 pass; the best `trials`
+    of them are compressed at level 9 with every strategy and the smallest
+    stream wins. No metadata is written, so the output is deterministic.
+    """
+    if img.mode != "P":
+        img = quantize(img.convert("RGB"))
+
+    # Keep only the palette entries in use
+    pixels = np.asarray(img)
+    used = np.flatnonzero(np.bincount(pixels.ravel(), minlength=256))
+    remap = np.zeros(256, dtype=np.uint8)
+    remap[used] = np.arange(len(used))
+    pixels = remap[pixels]
+    palette = np.array(img.getpalette()[:768], dtype=np.uint8).reshape(-1, 3)[used].ravel()
+
+    filtered = {kind: filter_rows(pixels, kind).tobytes() for kind in FILTERS}
+    ranked = sorted(FILTERS, key=lambda kind: len(zlib.compress(filtered[kind], 6)))
+
+    best = None
+    for kind in ranked[:max(trials, 1)]:
+        for strategy in STRATEGIES:
+            z = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+            idat = z.compress(filtered[kind]) + z.flush()
+            if best is None or len(idat) < len(best):
+                best = idat
+
+    return encode(pixels, palette, best)
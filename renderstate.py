@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from PIL import Image
+
+RENDER_STATE_DIR = Path(os.getenv("SOTA_STATE_DIR", "render_state"))
+
+
+class RenderState:
+    """
+    What the previous SOTA map render looked like.
+
+    `state.json` holds the layout (zoom, tile origin, size, marker mode,
+    output scales), the build time of the basemap and the summit codes
+    already drawn; `basemap.png` is the clean stitched mosaic, `marked.png`
+    the first output with markers before the final save, and
+    `marked-<i>.png` the other outputs.
+    """
+
+    def __init__(self, root=RENDER_STATE_DIR):
+        self.root = Path(root)
+        self.meta_path = self.root / "state.json"
+        try:
+            self.meta = json.loads(self.meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            self.meta = None
+
+    def matches(self, layout, max_age):
+        """Same layout and a basemap younger than `max_age` seconds"""
+        if self.meta is None or self.meta.get("layout") != layout:
+            return False
+        return time.time() - self.meta.get("built", 0) < max_age
+
+    def drawn(self):
+        return set(self.meta["codes"]) if self.meta else set()
+
+    def basemap(self):
+        return Image.open(self.root / "basemap.png").convert("RGB")
+
+    def marked(self, i=0):
+        return Image.open(self.root / self.marked_name(i)).convert("RGB")
+
+    @staticmethod
+    def marked_name(i):
+        return "marked.png" if i == 0 else f"marked-{i}.png"
+
+    def save(self, layout, codes, marked, basemap=None):
+        """
+        Store the new render: `marked` is one image or a list, one per output;
+        `basemap` is None when it was reused.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        built = self.meta["built"] if basemap is None else time.time()
+        if basemap is not None:
+            basemap.save(self.root / "basemap.png", format="PNG", compress_level=1)
+        for i, img in enumerate(marked if isinstance(marked, list) else [marked]):
+            img.save(self.root / self.marked_name(i), format="PNG", compress_level=1)
+        self.meta = {"layout": layout, "built": built, "codes": sorted(codes)}
+        self.meta_path.write_text(json.dumps(self.meta))
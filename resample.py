@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def date_grid(start, end, step_days=7):
+    """Every `step_days` from `start`, always ending exactly on `end` (datetime64[D])"""
+    start = np.datetime64(start, "D")
+    end = np.datetime64(end, "D")
+    grid = np.arange(start, end + np.timedelta64(1, "D"), np.timedelta64(step_days, "D"))
+    if grid[-1] != end:
+        grid = np.append(grid, end)
+    return grid
+
+
+def resample_step(grid, series):
+    """
+    Last value carried forward of several step functions on one grid.
+
+    `series` is a list of `(days, values)` array pairs with sorted days. Returns
+    an array of shape `(len(series), len(grid))`; grid points before the first
+    day of a series are 0.
+    """
+    grid = np.asarray(grid, dtype="datetime64[D]")
+    out = np.zeros((len(series), len(grid)), dtype=np.int64)
+    for row, (days, values) in zip(out, series):
+        idx = np.searchsorted(np.asarray(days, dtype="datetime64[D]"), grid, side="right") - 1
+        known = idx >= 0
+        row[known] = np.asarray(values)[idx[known]]
+    return out
+
+
+def lead_lag_text(mine, theirs):
+    """
+    "Lemaradás"/"Előny"/"Holtverseny" hover labels for two resampled series,
+    built with vectorized string operations.
+    """
+    mine = np.asarray(mine)
+    theirs = np.asarray(theirs)
+    diff = theirs - mine
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(theirs > 0, diff / np.where(theirs > 0, theirs, 1) * 100, 0.0)
+
+    amount = np.char.add(np.char.mod("%d", np.abs(diff)), " (")
+    amount = np.char.add(np.char.add(amount, np.char.mod("%.1f", np.abs(pct))), "%)")
+    return np.where(
+        diff > 0, np.char.add("Lemaradás: ", amount),
+        np.where(diff < 0, np.char.add("Előny: ", amount), "Holtverseny")
+    )
+
+
+def lttb(x, y, points):
+    """
+    Indices of `points` samples chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last samples are always kept; every bucket in between keeps
+    the sample forming the largest triangle with the previously kept one and
+    the average of the next bucket, which preserves the visual shape.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    bounds = np.floor(np.arange(points - 1) * (n - 2) / (points - 2)).astype(np.int64) + 1
+    bounds = np.append(bounds, n)
+    bounds[-2] = n - 1
+
+    out = np.empty(points, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_end = bounds[i + 2]
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def downsample_recent(days, values, points, full_since):
+    """
+    Indices of a series with the days before `full_since` reduced to about
+    `points` samples by `lttb`; days from `full_since` on are all kept.
+    """
+    days = np.asarray(days, dtype="datetime64[D]")
+    split = int(np.searchsorted(days, np.datetime64(full_since, "D")))
+    old = lttb(days[:split].astype(np.float64), np.asarray(values)[:split], points)
+    return np.concatenate([old, np.arange(split, len(days))])
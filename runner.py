@@ -0,0 +1,165 @@
+"""
+Generate every report in one process.
+
+    uv run runner.py [--processes] [REPORT ...]
+
+The reports' fetches run concurrently on threads; each report renders as soon
+as its own data is in. With --processes (or REPORT_PROCESSES=1) the
+CPU-heavy renders go to a process pool instead. A failing stage is logged
+and the other stages and reports still finish; a report whose fetch fails
+skips its renders. The exit status is 1 if any stage failed. A
+per-stage timing summary is printed at the end. With METRICS_DIR set, the
+metrics of all reports, including the renders in the process pool, go to
+METRICS_DIR/runner.json.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+
+USE_PROCESSES = os.getenv("REPORT_PROCESSES", "0") not in ("", "0")
+
+
+def sota_fetch():
+    from main import fetch_sota_activations
+    return fetch_sota_activations()
+
+def sota_html(data):
+    from main import output_to_html
+    output_to_html(data, "sota.html")
+
+def sota_png(data):
+    from staticmap import output_to_png
+    output_to_png(data, "sota.png")
+
+def wwa_fetch():
+    from wwa import fetch_all, get_callsigns, get_periods
+    return fetch_all(get_callsigns(), get_periods())
+
+def wwa_svg(data):
+    from wwa import save_badges
+    failed = save_badges(data)
+    if failed:
+        raise RuntimeError(f"{failed} WWA badge(s) could not be fetched")
+
+def geocaching_fetch():
+    from geocaching_hu_api_viz import fetch_finds, full_resync_requested, load_users
+    config = load_users()
+    return config, fetch_finds(config, full_resync_requested())
+
+def geocaching_chart(data):
+    from geocaching_hu_api_viz import report
+    report(*data)
+
+
+# name: (fetch, [(stage, render, cpu_heavy), ...])
+REPORTS = {
+    "sota": (sota_fetch, [("html", sota_html, False), ("png", sota_png, True)]),
+    "wwa": (wwa_fetch, [("svg", wwa_svg, False)]),
+    "geocaching": (geocaching_fetch, [("chart", geocaching_chart, True)]),
+}
+
+
+class Timings:
+    """(report, stage, seconds, ok) rows, appended from any thread"""
+
+    def __init__(self):
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def run(self, report, stage, fn, *args):
+        start = time.perf_counter()
+        ok = False
+        try:
+            with metrics.span(f"report.{report}.{stage}"):
+                result = fn(*args)
+            ok = True
+            return result
+        finally:
+            with self.lock:
+                self.rows.append((report, stage, time.perf_counter() - start, ok))
+
+    def summary(self, total):
+        lines = ["", "Stage timings:"]
+        for report, stage, seconds, ok in self.rows:
+            lines.append(f"  {report:>10} {stage:<6} {seconds:7.2f} s{'' if ok else '  FAILED'}")
+        lines.append(f"  {'total':>10} {'':<6} {total:7.2f} s")
+        return "\n".join(lines)
+
+
+def render_in_process(render, data):
+    """Run `render` in a pool worker and hand its metrics back to the parent"""
+    metrics.snapshot(reset=True)
+    render(data)
+    return metrics.snapshot(reset=True)
+
+
+def run_stage(timings, name, stage, fn, *args):
+    """`timings.run` that logs a failure instead of raising; returns (ok, result)"""
+    try:
+        return True, timings.run(name, stage, fn, *args)
+    except (Exception, SystemExit):
+        print(f"Report {name} {stage} failed:", file=sys.stderr)
+        traceback.print_exc()
+        return False, None
+
+
+def run_report(name, timings, processes=None):
+    """Fetch and render one report; returns False if any stage failed"""
+    fetch, renders = REPORTS[name]
+    ok, data = run_stage(timings, name, "fetch", fetch)
+    if not ok:
+        return False
+    # Every render gets its own chance: a failed sota.html still leaves sota.png
+    for stage, render, cpu_heavy in renders:
+        if processes is not None and cpu_heavy:
+            good, _ = run_stage(timings, name, stage, lambda: metrics.merge(
+                processes.submit(render_in_process, render, data).result()
+            ))
+        else:
+            good, _ = run_stage(timings, name, stage, render, data)
+        ok = ok and good
+    return ok
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    use_processes = USE_PROCESSES or "--processes" in argv
+    names = [a for a in argv if not a.startswith("--")] or list(REPORTS)
+    unknown = set(names) - set(REPORTS)
+    if unknown:
+        raise SystemExit(f"Unknown report: {', '.join(sorted(unknown))} (choose from {', '.join(REPORTS)})")
+
+    timings = Timings()
+    start = time.perf_counter()
+    with metrics.run("runner"):
+        # Not forked: the workers start while other threads are mid-request
+        # and may hold locks (metrics, HTTP pools) that a fork would copy
+        # locked
+        processes = ProcessPoolExecutor(mp_context=multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        )) if use_processes else None
+        try:
+            with ThreadPoolExecutor(max_workers=len(names)) as pool:
+                ok = list(pool.map(lambda name: run_report(name, timings, processes), names))
+        finally:
+            if processes is not None:
+                processes.shutdown()
+        for name, good in zip(names, ok):
+            metrics.value(f"report.{name}.ok", good)
+    print(timings.summary(time.perf_counter() - start))
+
+    failed = [name for name, good in zip(names, ok) if not good]
+    if failed:
+        print(f"Failed reports: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
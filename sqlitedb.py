@@ -0,0 +1,29 @@
+import sqlite3
+from pathlib import Path
+
+
+def open_versioned_db(path, version, ddl, rebuild=()):
+    """
+    Connect to the SQLite file at `path` and create its tables with the
+    `ddl` script.
+
+    `version` is the store's table layout version, kept in `PRAGMA
+    user_version` and bumped whenever the layout changes. A new file is
+    stamped with it. In a file of another version the `rebuild` tables, which
+    the store can fill again from their source, are dropped and recreated;
+    without `rebuild` such a file is refused with a ValueError, so that data
+    that cannot be fetched again is never dropped.
+    """
+    path = Path(path)
+    db = sqlite3.connect(path)
+    found = db.execute("PRAGMA user_version").fetchone()[0]
+    if found != version:
+        tables = db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        if tables and not rebuild:
+            db.close()
+            raise ValueError(f"{path} has table layout version {found}, expected {version}")
+        for name in rebuild:
+            db.execute(f'DROP TABLE IF EXISTS "{name}"')
+        db.execute(f"PRAGMA user_version = {int(version)}")
+    db.executescript(ddl)
+    return db
@@ -0,0 +1,330 @@
+import math
+import mercantile
+import metrics
+import numpy as np
+import os
+import threading
+import time
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+from buildcache import BuildCache, fingerprint, renderer_version
+from concurrent.futures import ThreadPoolExecutor
+from httpclient import HttpClient
+from io import BytesIO
+from markers import dedupe_activations, draw_heatmap, draw_markers
+from pathlib import Path
+from pngopt import optimize as optimize_png
+from renderstate import RenderState
+from tilecache import TILE_CACHE_TTL, TileCache
+from urllib.parse import urlsplit
+
+# OSM tile usage policy: keep the number of parallel connections low and
+# do not hammer the servers. Both limits apply per tile host.
+TILE_WORKERS = int(os.getenv("TILE_WORKERS", "2"))
+TILE_RPS = float(os.getenv("TILE_RPS", "8"))
+TILE_URL = os.getenv("TILE_URL", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+
+# "dots", "sized" (radius grows with activation count) or "heatmap"
+MARKER_MODE = os.getenv("SOTA_MARKERS", "dots")
+
+# Output size of the static map and the minimum margin around the markers,
+# in pixels
+MAP_WIDTH = int(os.getenv("SOTA_PNG_WIDTH", "1200"))
+MAP_HEIGHT = int(os.getenv("SOTA_PNG_HEIGHT", "800"))
+MAP_PADDING = int(os.getenv("SOTA_PNG_PADDING", "40"))
+# Output sizes as multiples of the map size, e.g. "0.25,1,2" for a thumbnail,
+# the standard map and a 2x retina one. Scale 1 is written to the given file
+# name, the others next to it as <name>@<scale>x.png.
+PNG_SCALES = tuple(float(s) for s in os.getenv("SOTA_PNG_SCALES", "1").split(","))
+
+# Write a palette-quantized, search-optimized PNG instead of a plain RGB one
+OPTIMIZE_PNG = os.getenv("SOTA_PNG_OPTIMIZE", "1") not in ("", "0")
+
+
+class HostLimiter:
+    """Per-host concurrency and requests-per-second limit"""
+
+    def __init__(self, max_concurrency=TILE_WORKERS, rps=TILE_RPS):
+        self.max_concurrency = max_concurrency
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def _host(self, host):
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = [threading.BoundedSemaphore(self.max_concurrency), 0.0]
+            return self.hosts[host]
+
+    def get(self, client, url, **kwargs):
+        entry = self._host(urlsplit(url).netloc)
+        with entry[0]:
+            with self.lock:
+                now = time.monotonic()
+                slot = max(now, entry[1])
+                entry[1] = slot + self.interval
+            if slot > now:
+                time.sleep(slot - now)
+            return client.get(url, **kwargs)
+
+
+def get_tile(z, x, y, client, cache, limiter=None):
+    """Return the encoded PNG bytes of a tile, exactly as served"""
+    cached = cache.lookup(z, x, y)
+    if cached is not None and cache.is_fresh(cached):
+        cache.record("hit")
+        return cache.read(z, x, y)
+
+    url = TILE_URL.format(z=z, x=x, y=y)
+    headers = cache.validators(cached)
+    with metrics.span("png.tile_download"):
+        if limiter is None:
+            resp = client.get(url, headers=headers, timeout=20)
+        else:
+            resp = limiter.get(client, url, headers=headers, timeout=20)
+
+    if cached is not None and resp.status_code == 304:
+        cache.revalidated(z, x, y, resp.headers)
+        return cache.read(z, x, y)
+    resp.raise_for_status()
+    cache.record("miss" if cached is None else "refreshed")
+
+    cache.store_tile(z, x, y, resp.content, resp.headers)
+    return resp.content
+
+def fetch_tiles(tiles, client, cache, workers=TILE_WORKERS, limiter=None):
+    """Fetch tiles in parallel, returned in the same order as `tiles`"""
+    if limiter is None:
+        limiter = HostLimiter()
+    if workers <= 1:
+        return [get_tile(t.z, t.x, t.y, client, cache, limiter) for t in tiles]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda t: get_tile(t.z, t.x, t.y, client, cache, limiter), tiles))
+
+def lonlat_to_pixels(lon, lat, zoom):
+    """Convert lon/lat (scalars or arrays) to global pixel coordinates"""
+    siny = np.sin(np.radians(np.asarray(lat, dtype=float)))
+    siny = np.clip(siny, -0.9999, 0.9999)
+
+    scale = 256 * (2 ** zoom)
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * scale
+    y = (0.5 - np.log((1 + siny) / (1 - siny)) / (4 * np.pi)) * scale
+    return x, y
+
+def choose_zoom(points, width=MAP_WIDTH, height=MAP_HEIGHT):
+    """Largest zoom at which all points fit into `width` x `height` pixels"""
+    MAX_ZOOM = 12
+    MIN_ZOOM = 4
+
+    # The pixel span doubles with every zoom level, so the bounding box at
+    # zoom 0 determines the largest zoom that still fits the target size.
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    xs, ys = lonlat_to_pixels(points[:, 1], points[:, 0], 0)
+    span_x = xs.max() - xs.min()
+    span_y = ys.max() - ys.min()
+
+    with np.errstate(divide="ignore"):
+        fit = min(np.log2(width / span_x), np.log2(height / span_y))
+    zoom = int(np.clip(np.floor(fit), MIN_ZOOM, MAX_ZOOM))
+
+    # Guard against log2 rounding right at a boundary
+    while zoom < MAX_ZOOM and span_x * 2 ** (zoom + 1) <= width and span_y * 2 ** (zoom + 1) <= height:
+        zoom += 1
+    while zoom > MIN_ZOOM and (span_x * 2 ** zoom > width or span_y * 2 ** zoom > height):
+        zoom -= 1
+
+    return zoom
+
+def viewport(points, zoom, width, height):
+    """Global pixel origin of a `width` x `height` window centered on the points"""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    xs, ys = lonlat_to_pixels(points[:, 1], points[:, 0], zoom)
+    left = int(round((xs.min() + xs.max()) / 2 - width / 2))
+    top = int(round((ys.min() + ys.max()) / 2 - height / 2))
+    # Stay inside the world vertically
+    top = min(max(top, 0), max(256 * 2 ** zoom - height, 0))
+    return left, top
+
+def viewport_tiles(origin, width, height, zoom):
+    """Tiles intersecting the viewport, in (y, x) paste order"""
+    TILE_SIZE = 256
+    last = 2 ** zoom - 1
+    min_x, max_x = origin[0] // TILE_SIZE, (origin[0] + width - 1) // TILE_SIZE
+    min_y, max_y = origin[1] // TILE_SIZE, (origin[1] + height - 1) // TILE_SIZE
+    return [
+        mercantile.Tile(x, y, zoom)
+        for y in range(max(min_y, 0), min(max_y, last) + 1)
+        for x in range(max(min_x, 0), min(max_x, last) + 1)
+    ]
+
+def stitch_tiles(tiles, origin, width, height):
+    """Paste `tiles` into a `width` x `height` canvas at global pixel `origin`"""
+    TILE_SIZE = 256
+
+    img = Image.new("RGB", (width, height))
+
+    client = HttpClient("SOTA-map-generator/1.0 (ham radio)", pool_size=max(TILE_WORKERS, 1))
+
+    tiles = sorted(
+        tiles,
+        key=lambda t: (t.y, t.x)
+    )
+
+    # Download in parallel, paste in the fixed (y, x) order. The cache is
+    # closed even if a tile fails, so the metadata of the others is kept.
+    cache = TileCache()
+    try:
+        cache.prefetch(tiles)
+        with metrics.span("png.tiles"):
+            fetched = fetch_tiles(tiles, client, cache)
+        with metrics.span("png.stitch"):
+            for t, tile in zip(tiles, fetched):
+                px = t.x * TILE_SIZE - origin[0]
+                py = t.y * TILE_SIZE - origin[1]
+                # Decoded here, once; paste converts palette tiles to RGB in place
+                # and clips the parts outside the canvas
+                img.paste(Image.open(BytesIO(tile)), (px, py))
+    finally:
+        cache.close()
+        client.close()
+
+    return img
+
+def draw_summits(img, summits, zoom, origin, markers, scale=1):
+    """Markers at `zoom`/`origin` coordinates, on an image drawn at `scale` times that size"""
+    coords = np.asarray([(lat, lon) for _, lat, lon, _ in summits], dtype=float).reshape(-1, 2)
+    gxs, gys = lonlat_to_pixels(coords[:, 1], coords[:, 0], zoom)
+    pxs = ((gxs - origin[0]) * scale).astype(int)
+    pys = ((gys - origin[1]) * scale).astype(int)
+    counts = np.array([count for _, _, _, count in summits])
+
+    metrics.count("png.points", len(summits))
+    with metrics.span("png.markers"):
+        if markers == "heatmap":
+            draw_heatmap(img, pxs, pys, counts, scale=scale)
+        else:
+            draw_markers(img, pxs, pys, counts, sized=(markers == "sized"), scale=scale)
+
+def scaled_filename(output_filename, scale):
+    """`sota.png` for scale 1, `sota@2x.png`, `sota@0.25x.png` and so on otherwise"""
+    if scale == 1:
+        return str(output_filename)
+    path = Path(output_filename)
+    return str(path.with_name(f"{path.stem}@{scale:g}x{path.suffix}"))
+
+def scaled_basemap(mosaic, size):
+    """The stitched mosaic at `size`, downsampled with Lanczos if it is larger"""
+    if mosaic.size == size:
+        return mosaic.copy()
+    with metrics.span("png.downsample"):
+        return mosaic.resize(size, Image.Resampling.LANCZOS)
+
+def output_to_png(data, output_filename, markers=MARKER_MODE, state=None, optimize=OPTIMIZE_PNG, build_cache=None,
+                  scales=PNG_SCALES):
+    """
+    Render the map once per scale and return `(file name, width)` pairs.
+    With several scales a `<name>.srcset` file holds the matching srcset value.
+    """
+    scales = sorted(set(scales))
+    outputs = [(scaled_filename(output_filename, s), round(MAP_WIDTH * s), round(MAP_HEIGHT * s)) for s in scales]
+    srcset = ", ".join(f"{Path(name).name} {w}w" for name, w, _ in outputs)
+    if len(outputs) > 1:
+        Path(output_filename).with_suffix(".srcset").write_text(srcset + "\n", encoding="utf-8")
+
+    # Skip everything, tiles included, when neither the activations nor the
+    # renderer changed. The tile cache TTL period is part of the inputs so
+    # that the map still picks up refreshed tiles.
+    build_cache = BuildCache() if build_cache is None else build_cache
+    inputs = fingerprint(data, markers, optimize, MAP_WIDTH, MAP_HEIGHT, MAP_PADDING, scales, TILE_URL,
+                         int(time.time() // TILE_CACHE_TTL))
+    version = renderer_version("staticmap.py", "markers.py", "pngopt.py")
+    # Every output is checked, so that each decision is logged; the map is
+    # drawn if any of them is missing, but only those are saved again
+    reused = [build_cache.reuse(name, inputs, version) for name, _, _ in outputs]
+    if all(reused):
+        for name, _, _ in outputs:
+            metrics.value(f"output.{Path(name).name.replace('.', '_')}.bytes", Path(name).stat().st_size)
+        return [(name, w) for name, w, _ in outputs]
+
+    summits = dedupe_activations(data)
+    points = [(lat, lon) for _, lat, lon, _ in summits]
+
+    if not points:
+        raise RuntimeError("No activation coordinates found")
+
+    ZOOM = choose_zoom(points, MAP_WIDTH - 2 * MAP_PADDING, MAP_HEIGHT - 2 * MAP_PADDING)
+    print(f"Using zoom level {ZOOM}")
+
+    # ------------------------------------------------------------
+    # Determine the viewport and the tiles it intersects. The mosaic is
+    # stitched once, at the zoom that covers the largest output; every
+    # output is derived from it.
+    # ------------------------------------------------------------
+    width, height = MAP_WIDTH, MAP_HEIGHT
+    origin = viewport(points, ZOOM, width, height)
+    factor = 2 ** max(math.ceil(math.log2(scales[-1])), 0)
+    mosaic_origin = (origin[0] * factor, origin[1] * factor)
+    mosaic_size = (width * factor, height * factor)
+    tiles = viewport_tiles(mosaic_origin, *mosaic_size, ZOOM + int(math.log2(factor)))
+
+    # ------------------------------------------------------------
+    # Reuse the previous render when the layout did not change
+    # ------------------------------------------------------------
+    if state is None:
+        state = RenderState()
+    layout = {
+        "zoom": ZOOM,
+        "origin": list(origin),
+        "size": [width, height],
+        "markers": markers,
+        "scales": scales,
+    }
+    codes = set(code for code, _, _, _ in summits)
+    basemap = None
+
+    if state.matches(layout, TILE_CACHE_TTL) and markers == "dots" and state.drawn() <= codes:
+        new = [s for s in summits if s[0] not in state.drawn()]
+        print(f"Layout unchanged, drawing {len(new)} new markers")
+        images = [state.marked(i) for i in range(len(scales))]
+        for img, scale in zip(images, scales):
+            draw_summits(img, new, ZOOM, origin, markers, scale)
+    else:
+        if state.matches(layout, TILE_CACHE_TTL):
+            print("Layout unchanged, redrawing markers on the cached basemap")
+            mosaic = state.basemap()
+        else:
+            basemap = mosaic = stitch_tiles(tiles, mosaic_origin, *mosaic_size)
+        images = [scaled_basemap(mosaic, (w, h)) for _, w, h in outputs]
+        # Markers are drawn on every size rather than scaled, so they stay crisp
+        for img, scale in zip(images, scales):
+            draw_summits(img, summits, ZOOM, origin, markers, scale)
+
+    state.save(layout, codes, images, basemap)
+
+    # ------------------------------------------------------------
+    # Save results
+    # ------------------------------------------------------------
+    for (name, _, _), img, done in zip(outputs, images, reused):
+        if not done:
+            with metrics.span("png.save"):
+                if optimize:
+                    Path(name).write_bytes(optimize_png(img))
+                else:
+                    raw = img.tobytes()
+                    stable = Image.frombytes("RGB", img.size, raw)
+                    pnginfo = PngInfo()  # EMPTY: no metadata
+                    stable.save(
+                        name,
+                        format="PNG",
+                        pngingo=pnginfo,
+                        optimize=False,
+                        compress_level=9,
+                        add_time=False
+                    )
+            build_cache.store(name, inputs, version)
+            print(f"Saved {name}")
+        metrics.value(f"output.{Path(name).name.replace('.', '_')}.bytes", Path(name).stat().st_size)
+    if len(outputs) > 1:
+        print(f"srcset: {srcset}")
+    return [(name, w) for name, w, _ in outputs]
@@ -0,0 +1,308 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import metrics
+
+# Tiles older than this are revalidated with a conditional request
+TILE_CACHE_TTL = float(os.getenv("TILE_CACHE_TTL_DAYS", "30")) * 86400
+# Least recently used tiles are evicted above this total size
+TILE_CACHE_MAX_BYTES = int(float(os.getenv("TILE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+# "mbtiles" (single SQLite file) or "directory" (one PNG per tile)
+TILE_CACHE_BACKEND = os.getenv("TILE_CACHE_BACKEND", "mbtiles")
+TILE_CACHE_ROOT = Path("tile_cache")
+
+
+class DirectoryStore:
+    """Tiles in `root/z/x/y.png`, metadata in `root/index.json`"""
+
+    def __init__(self, root=TILE_CACHE_ROOT):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+
+    def path(self, z, x, y):
+        return self.root / str(z) / str(x) / f"{y}.png"
+
+    def load_index(self):
+        try:
+            index = json.loads(self.index_path.read_text())
+        except (FileNotFoundError, ValueError):
+            index = {}
+        # Tiles from before the index existed: no validators
+        for path in self.root.glob("*/*/*.png"):
+            key = f"{path.parts[-3]}/{path.parts[-2]}/{path.stem}"
+            if key not in index:
+                st = path.stat()
+                index[key] = {"fetched": st.st_mtime, "size": st.st_size}
+        return index
+
+    def read_many(self, keys):
+        found = {}
+        for z, x, y in keys:
+            try:
+                found[(z, x, y)] = self.path(z, x, y).read_bytes()
+            except FileNotFoundError:
+                pass
+        return found
+
+    def write(self, z, x, y, content):
+        path = self.path(z, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(content)
+        tmp.replace(path)
+
+    def delete(self, keys):
+        for z, x, y in keys:
+            self.path(z, x, y).unlink(missing_ok=True)
+
+    def close(self, index):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(index, sort_keys=True))
+        tmp.replace(self.index_path)
+
+
+class MBTilesStore:
+    """
+    Single-file MBTiles (SQLite) store.
+
+    Tiles follow the MBTiles spec (`tiles` table, TMS row order), so the file
+    opens in any MBTiles viewer. Cache metadata lives in an extra `tile_meta`
+    table keyed the same way.
+    """
+
+    def __init__(self, path=TILE_CACHE_ROOT / "tiles.mbtiles"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            );
+            CREATE TABLE IF NOT EXISTS tile_meta (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER,
+                etag TEXT, last_modified TEXT, fetched REAL, used REAL, size INTEGER,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            );
+            INSERT OR IGNORE INTO metadata VALUES ('name', 'OpenStreetMap tile cache');
+            INSERT OR IGNORE INTO metadata VALUES ('format', 'png');
+            INSERT OR IGNORE INTO metadata VALUES ('type', 'baselayer');
+        """)
+
+    @staticmethod
+    def row(z, y):
+        return (1 << int(z)) - 1 - int(y)
+
+    def load_index(self):
+        index = {}
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT zoom_level, tile_column, tile_row, etag, last_modified, fetched, used, size FROM tile_meta"
+            ).fetchall()
+        for z, x, row, etag, last_modified, fetched, used, size in rows:
+            meta = {"fetched": fetched, "used": used, "size": size}
+            if etag:
+                meta["etag"] = etag
+            if last_modified:
+                meta["last_modified"] = last_modified
+            index[f"{z}/{x}/{self.row(z, row)}"] = meta
+        return index
+
+    def read_many(self, keys):
+        """One range query per zoom level for the bounding box of `keys`"""
+        wanted = set((int(z), int(x), int(y)) for z, x, y in keys)
+        found = {}
+        for z in set(k[0] for k in wanted):
+            xs = [k[1] for k in wanted if k[0] == z]
+            rows = [self.row(z, k[2]) for k in wanted if k[0] == z]
+            with self.lock:
+                result = self.db.execute(
+                    "SELECT tile_column, tile_row, tile_data FROM tiles"
+                    " WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?",
+                    (z, min(xs), max(xs), min(rows), max(rows))
+                ).fetchall()
+            for x, row, data in result:
+                key = (z, x, self.row(z, row))
+                if key in wanted:
+                    found[key] = bytes(data)
+        return found
+
+    def write(self, z, x, y, content):
+        # Committed right away, so a run that fails later keeps the tiles it got
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                (int(z), int(x), self.row(z, y), sqlite3.Binary(content))
+            )
+
+    def delete(self, keys):
+        params = [(int(z), int(x), self.row(z, y)) for z, x, y in keys]
+        with self.lock:
+            self.db.executemany(
+                "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", params
+            )
+
+    def close(self, index):
+        params = []
+        for key, meta in index.items():
+            z, x, y = key.split("/")
+            params.append((
+                int(z), int(x), self.row(z, y),
+                meta.get("etag"), meta.get("last_modified"),
+                meta["fetched"], meta.get("used", meta["fetched"]), meta.get("size", 0)
+            ))
+        with self.lock:
+            self.db.execute("DELETE FROM tile_meta")
+            self.db.executemany("INSERT INTO tile_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?)", params)
+            self.db.commit()
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.db.close()
+
+
+def migrate_directory(src, dst):
+    """Move tiles from a `DirectoryStore` layout into `dst`, removing the originals"""
+    src = DirectoryStore(src)
+    index = src.load_index()
+    if not index:
+        return 0
+    merged = dst.load_index()
+    for key, meta in index.items():
+        z, x, y = key.split("/")
+        path = src.path(z, x, y)
+        dst.write(z, x, y, path.read_bytes())
+        merged[key] = meta
+    dst.close(merged)
+    for key in index:
+        z, x, y = key.split("/")
+        src.path(z, x, y).unlink()
+    src.index_path.unlink(missing_ok=True)
+    for path in sorted(src.root.glob("*/*"), reverse=True) + sorted(src.root.glob("*")):
+        if path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+    print(f"Migrated {len(index)} tiles from {src.root}/ to {dst.path}")
+    return len(index)
+
+
+def open_store(backend=TILE_CACHE_BACKEND, root=TILE_CACHE_ROOT):
+    if backend == "directory":
+        return DirectoryStore(root)
+    if backend == "mbtiles":
+        path = Path(root) / "tiles.mbtiles"
+        if any(Path(root).glob("*/*/*.png")):
+            migrate_directory(root, MBTilesStore(path))
+        return MBTilesStore(path)
+    raise ValueError(f"Unknown tile cache backend: {backend}")
+
+
+class TileCache:
+    """
+    Tile cache with HTTP validators and LRU size cap on top of a store.
+
+    Per-tile metadata (ETag, Last-Modified, fetch time, last use, size) is kept
+    in memory and persisted by the store on `close()`, after eviction.
+    """
+
+    def __init__(self, store=None, ttl=TILE_CACHE_TTL, max_bytes=TILE_CACHE_MAX_BYTES):
+        self.store = store if store is not None else open_store()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.index = self.store.load_index()
+        self.loaded = {}
+
+    def prefetch(self, tiles):
+        """Batch-load the cached bodies of `tiles` (mercantile.Tile-like)"""
+        keys = [(t.z, t.x, t.y) for t in tiles if f"{t.z}/{t.x}/{t.y}" in self.index]
+        found = self.store.read_many(keys)
+        with self.lock:
+            self.loaded.update(found)
+
+    def read(self, z, x, y):
+        with self.lock:
+            content = self.loaded.pop((z, x, y), None)
+        if content is None:
+            content = self.store.read_many([(z, x, y)])[(z, x, y)]
+        return content
+
+    def lookup(self, z, x, y):
+        """Return the metadata of a cached tile, or None"""
+        with self.lock:
+            meta = self.index.get(f"{z}/{x}/{y}")
+            if meta is not None:
+                meta["used"] = time.time()
+            return meta
+
+    def is_fresh(self, meta):
+        return time.time() - meta["fetched"] < self.ttl
+
+    def validators(self, meta):
+        """Conditional request headers for a stale tile"""
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def record(self, kind):
+        with self.lock:
+            self.stats[kind] += 1
+
+    def revalidated(self, z, x, y, headers):
+        """The server answered 304: the cached body is still current"""
+        with self.lock:
+            meta = self.index[f"{z}/{x}/{y}"]
+            meta["fetched"] = time.time()
+            if headers.get("ETag"):
+                meta["etag"] = headers["ETag"]
+            self.stats["revalidated"] += 1
+
+    def store_tile(self, z, x, y, content, headers):
+        self.store.write(z, x, y, content)
+
+        now = time.time()
+        meta = {"fetched": now, "used": now, "size": len(content)}
+        if headers.get("ETag"):
+            meta["etag"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            meta["last_modified"] = headers["Last-Modified"]
+        with self.lock:
+            self.index[f"{z}/{x}/{y}"] = meta
+
+    def evict(self):
+        """Drop least recently used tiles until the cache fits `max_bytes`"""
+        with self.lock:
+            total = sum(m.get("size", 0) for m in self.index.values())
+            lru = sorted(self.index.items(), key=lambda kv: kv[1].get("used", kv[1]["fetched"]))
+            evicted = []
+            for key, meta in lru:
+                if total <= self.max_bytes:
+                    break
+                evicted.append(tuple(key.split("/")))
+                total -= meta.get("size", 0)
+                del self.index[key]
+            self.stats["evicted"] += len(evicted)
+        if evicted:
+            self.store.delete(evicted)
+
+    def close(self):
+        self.evict()
+        self.store.close(self.index)
+        s = self.stats
+        for kind, n in s.items():
+            metrics.count(f"tiles.{kind}", n)
+        print(
+            f"Tile cache: {s['hit']} hits, {s['miss']} misses, "
+            f"{s['revalidated']} revalidated, {s['refreshed']} refreshed, "
+            f"{s['evicted']} evicted"
+        )
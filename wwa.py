@@ -1,37 +1,77 @@
+import metrics
 import os
-import requests
-from bs4 import BeautifulSoup
+import re
+import sys
+from buildcache import BuildCache, fingerprint, renderer_version
+from concurrent.futures import ThreadPoolExecutor
+from httpclient import HttpClient
 from pathlib import Path
+from wwastore import StatsHistory
 
 def get_callsign():
     callsign = os.getenv("CALLSIGN")
     return callsign if callsign else os.environ["GITHUB_REPOSITORY_OWNER"]
 
-CALLSIGN = get_callsign().upper()
-OUTFILE = Path("wwa-2026-jan.svg")
-
-URL = (
-    "https://hamaward.cloud/aw405"
+def get_callsigns():
+    """WWA_CALLSIGNS (comma separated, e.g. the club's members), else the own callsign"""
+    callsigns = [c.strip().upper() for c in os.getenv("WWA_CALLSIGNS", "").split(",") if c.strip()]
+    return callsigns or [get_callsign().upper()]
+
+# (hamaward award, badge label, badge title, output file slug)
+PERIODS = [("aw405", "WWA 2026 Jan", "WWA 2026 January", "2026-jan")]
+
+def get_periods():
+    """
+    WWA_PERIODS, e.g. "aw405:2026-jan:WWA 2026 Jan:WWA 2026 January,aw406:2026-feb:WWA 2026 Feb"
+    (the title defaults to the label), else PERIODS
+    """
+    periods = []
+    for entry in os.getenv("WWA_PERIODS", "").split(","):
+        if entry.strip():
+            award, slug, label, *title = [f.strip() for f in entry.split(":")]
+            periods.append((award, label, title[0] if title else label, slug))
+    return periods or PERIODS
+
+URL = os.getenv("WWA_URL") or (
+    "https://hamaward.cloud/{award}"
     "?iframe=1&nojs=0&tab=4"
     "&activator_call=WWA"
     "&score=1"
-    f"&callsign={CALLSIGN}"
+    "&callsign={callsign}"
     "&score_name=all_mix"
     "&country=Hungary"
 )
 
-HEADERS = {
-    "User-Agent": "WWA-badge/1.0"
-}
+USER_AGENT = "WWA-badge/1.0"
+# Concurrent standings requests in a batch
+MAX_WORKERS = 8
+# The badge's score/rank sparkline covers the latest SPARKLINE_RUNS results
+SPARKLINE_RUNS = 30
+SPARKLINE_WIDTH = 80
+SPARKLINE_HEIGHT = 28
+
+# Only the results table is parsed: from its start up to its third row,
+# i.e. the header and the callsign's own row
+TABLE_START = re.compile(r"""<div\b[^>]*\bid\s*=\s*["']?resp-table\b""")
+ROW_START = re.compile(r"""<div\b[^>]*\bclass\s*=\s*["'][^"']*\bresp-table-row\b""")
+
 
+def table_fragment(text):
+    """The header and first result row of `#resp-table` as an HTML fragment"""
+    table = TABLE_START.search(text)
+    if table is None:
+        raise ValueError("No #resp-table in the standings page")
+    rows = [m.start() for _, m in zip(range(3), ROW_START.finditer(text, table.end()))]
+    return text[rows[0] if rows else table.end():rows[2] if len(rows) == 3 else len(text)]
 
-def fetch_stats():
-    r = requests.get(URL, headers=HEADERS, timeout=10)
-    r.raise_for_status()
 
-    soup = BeautifulSoup(r.text, "html.parser")
-    table = soup.find("div", id="resp-table")
-    rows = table.find_all("div", class_="resp-table-row")
+def parse_stats(text):
+    """(Valid QSO, Score, Rank) from a standings page"""
+    from bs4 import BeautifulSoup
+
+    rows = BeautifulSoup(table_fragment(text), "html.parser").find_all("div", class_="resp-table-row")
+    if len(rows) < 2:
+        raise ValueError("No result row in the standings page")
 
     header = [
         c.get_text(strip=True)
@@ -49,22 +89,97 @@ def fetch_stats():
     return data["Valid QSO"], data["Score"], data["Rank"]
 
 
-def generate_svg(qsos, score, rank):
+def fetch_stats(callsign, client=None, award=PERIODS[0][0]):
+    if client is None:
+        with HttpClient(USER_AGENT) as client:
+            return fetch_stats(callsign, client, award)
+
+    # No response cache: every result goes into the history as a new
+    # observation, so it has to be a fresh one
+    with metrics.span("wwa.request"):
+        r = client.get(URL.format(callsign=callsign, award=award), timeout=10)
+        r.raise_for_status()
+
+    with metrics.span("wwa.parse"):
+        return parse_stats(r.text)
+
+
+def fetch_all(callsigns, periods, client=None):
+    """
+    Stats of every (callsign, period) pair, fetched concurrently over one
+    session: `[(callsign, period, stats)]`, stats None where the fetch failed.
+    """
+    entries = [(callsign, period) for period in periods for callsign in callsigns]
+    workers = max(1, min(MAX_WORKERS, len(entries)))
+    if client is None:
+        with HttpClient(USER_AGENT, pool_size=workers) as client:
+            return fetch_all(callsigns, periods, client)
+
+    def fetch(entry):
+        callsign, period = entry
+        try:
+            return fetch_stats(callsign, client, period[0])
+        except Exception as e:
+            print(f"WWA {period[1]} {callsign}: {e}", file=sys.stderr)
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        stats = list(pool.map(fetch, entries))
+    return [(callsign, period, s) for (callsign, period), s in zip(entries, stats)]
+
+
+def outfile(callsign, period, batch=False):
+    """wwa-<slug>.svg, or wwa-<slug>-<callsign>.svg when badges are made for several callsigns"""
+    slug = period[3]
+    return Path(f"wwa-{slug}-{callsign.lower()}.svg" if batch else f"wwa-{slug}.svg")
+
+
+def sparkline(values, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT, invert=False):
+    """SVG polyline points spreading `values` over the box; `invert` puts low values on top"""
+    lo, hi = min(values), max(values)
+    step = width / (len(values) - 1)
+    points = []
+    for i, v in enumerate(values):
+        y = 0.5 if hi == lo else (v - lo) / (hi - lo)
+        y = y if invert else 1 - y
+        points.append(f"{i * step:.1f},{y * height:.1f}")
+    return " ".join(points)
+
+def sparkline_svg(history):
+    """Score and rank (better rank up) lines of the `(qsos, score, rank)` history"""
+    scores = [score for _, score, _ in history]
+    ranks = [rank for _, _, rank in history]
+    return f"""
+  <g transform="translate(472,8)">
+    <polyline points="{sparkline(scores)}"
+              fill="none" stroke="#a5b4fc" stroke-width="1.5"/>
+    <polyline points="{sparkline(ranks, invert=True)}"
+              fill="none" stroke="#fbbf24" stroke-width="1.5"/>
+  </g>"""
+
+def generate_svg(callsign, qsos, score, rank, label=PERIODS[0][1], title=PERIODS[0][2], history=None):
+    """
+    The badge; with a `history` of at least two `(qsos, score, rank)`
+    results it is widened by a score/rank sparkline.
+    """
+    spark = sparkline_svg(history) if history and len(history) >= 2 else ""
+    width = 480 + (SPARKLINE_WIDTH + 12 if spark else 0)
+    runs = f"\n    | Score/rank: last {len(history)} runs" if spark else ""
     return f"""<?xml version="1.0" encoding="UTF-8"?>
-<svg xmlns="http://www.w3.org/2000/svg" width="480" height="44">
-  <rect x="0" y="0" width="480" height="44" rx="6" fill="#1e293b"/>
+<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="44">
+  <rect x="0" y="0" width="{width}" height="44" rx="6" fill="#1e293b"/>
   <rect x="0" y="0" width="120" height="44" rx="6" fill="#334155"/>
 
   <text x="60" y="28" text-anchor="middle"
         font-family="Arial, Helvetica, sans-serif"
         font-size="13" font-weight="bold" fill="#e5e7eb">
-    WWA 2026 Jan
+    {label}
   </text>
 
   <text x="135" y="28"
         font-family="Arial, Helvetica, sans-serif"
         font-size="14" fill="#e5e7eb">
-    {CALLSIGN}
+    {callsign}
   </text>
 
   <text x="205" y="28"
@@ -86,18 +201,54 @@ def generate_svg(qsos, score, rank):
   </text>
 
   <title>
-    WWA 2026 January — {CALLSIGN}
+    {title} — {callsign}
     | QSOs: {qsos}
     | Score: {score}
-    | Rank: {rank}
-  </title>
+    | Rank: {rank}{runs}
+  </title>{spark}
 </svg>
 """
 
+def save_badges(results, history=None):
+    """
+    Append the fetched `fetch_all` entries to the history and write one
+    badge per entry; returns the number of entries that could not be fetched.
+    """
+    if history is None:
+        history = StatsHistory()
+        try:
+            return save_badges(results, history)
+        finally:
+            history.close()
+
+    with metrics.span("wwa.history"):
+        history.append([(callsign, period[0], *stats) for callsign, period, stats in results if stats is not None])
+
+    build_cache = BuildCache()
+    version = renderer_version("wwa.py")
+    batch = len({callsign for callsign, _, _ in results}) > 1
+    failed = 0
+    for callsign, period, stats in results:
+        if stats is None:
+            failed += 1
+            continue
+        with metrics.span("wwa.history"):
+            recent = [row[1:] for row in history.window(callsign, period[0], SPARKLINE_RUNS)]
+        path = outfile(callsign, period, batch)
+        inputs = fingerprint(callsign, period, stats, recent)
+        if not build_cache.reuse(path, inputs, version):
+            path.write_text(generate_svg(callsign, *stats, label=period[1], title=period[2], history=recent),
+                            encoding="utf-8")
+            build_cache.store(path, inputs, version)
+            metrics.count("wwa.badges")
+        metrics.value(f"output.{path.name.replace('.', '_')}.bytes", path.stat().st_size)
+    return failed
+
 def main():
-    qsos, score, rank = fetch_stats()
-    svg = generate_svg(qsos, score, rank)
-    OUTFILE.write_text(svg, encoding="utf-8")
+    with metrics.run("wwa"):
+        failed = save_badges(fetch_all(get_callsigns(), get_periods()))
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,51 @@
+import os
+import time
+from pathlib import Path
+
+from sqlitedb import open_versioned_db
+
+WWA_HISTORY_PATH = Path(os.getenv("WWA_HISTORY", "wwa_history.sqlite"))
+# The history cannot be fetched again: a file of another layout version is
+# refused rather than rebuilt, so a layout change needs a migration here
+SCHEMA_VERSION = 1
+
+
+class StatsHistory:
+    """
+    Every fetched (QSOs, score, rank) of a callsign in an award, in SQLite.
+
+    Rows are only ever appended. The table is clustered on (callsign, award,
+    fetch time), so the latest entries of one badge are read from the end of
+    its range without touching the rest of the history.
+    """
+
+    def __init__(self, path=WWA_HISTORY_PATH):
+        self.path = Path(path)
+        self.db = open_versioned_db(self.path, SCHEMA_VERSION, """
+            CREATE TABLE IF NOT EXISTS stats (
+                callsign TEXT, award TEXT, fetched REAL,
+                qsos INTEGER, score INTEGER, rank INTEGER,
+                PRIMARY KEY (callsign, award, fetched)
+            ) WITHOUT ROWID;
+        """)
+
+    def append(self, entries, fetched=None):
+        """Add `(callsign, award, qsos, score, rank)` entries, all stamped `fetched` (default now)"""
+        fetched = time.time() if fetched is None else fetched
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?, ?)",
+                [(callsign, award, fetched, qsos, score, rank) for callsign, award, qsos, score, rank in entries]
+            )
+
+    def window(self, callsign, award, size):
+        """The latest `size` entries as `(fetched, qsos, score, rank)` tuples, oldest first"""
+        rows = self.db.execute(
+            "SELECT fetched, qsos, score, rank FROM stats WHERE callsign = ? AND award = ? "
+            "ORDER BY fetched DESC LIMIT ?",
+            (callsign, award, size)
+        ).fetchall()
+        return rows[::-1]
+
+    def close(self):
+        self.db.close()